@@ -0,0 +1,53 @@
+import codecs
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Класс рендерера JSON на orjson с выводом, совпадающим с JSONRenderer.
+
+    Типы, которые orjson не сериализует сам (time, timedelta, Decimal, datetime и др.), передаются в default
+    кодировщика DRF, поэтому их формат не меняется. Без orjson, а также для отступов и ASCII-вывода,
+    используется стандартный JSONRenderer.
+    """
+
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Метод сериализует данные в JSON."""
+
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.default, option=ORJSON_OPTIONS)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """Класс парсера JSON на orjson. Без orjson или для кодировок, отличных от UTF-8, используется JSONParser."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Метод разбирает тело запроса в формате JSON."""
+
+        if orjson is None or codecs.lookup(get_encoding(parser_context or {})).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -165,6 +165,15 @@ SIMPLE_JWT = {
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": ("rest_framework_simplejwt.authentication.JWTAuthentication",),
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.AllowAny"],
+    "DEFAULT_RENDERER_CLASSES": (
+        "Coursework_6_DRF.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "Coursework_6_DRF.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 CSRF_TRUSTED_ORIGINS = ["http://localhost:8000", "http://127.0.0.1:8000",
@@ -177,6 +186,14 @@ CORS_ALLOW_ALL_ORIGINS = False
 
 CORS_ALLOW_CREDENTIALS = True
 
+if os.getenv('SERVER_REDIS') and 'test' not in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv('SERVER_REDIS'),
+        }
+    }
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
@@ -187,11 +204,42 @@ CELERY_TASK_TRACK_STARTED = True
 
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
-CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+if 'test' in sys.argv:
+    CELERY_TASK_ALWAYS_EAGER = True
+
+CELERY_BEAT_SCHEDULER = "users.schedulers:LeaderDatabaseScheduler"
+
+CELERY_BEAT_LEADER_LEASE = int(os.getenv('CELERY_BEAT_LEADER_LEASE') or 30)
 
 CELERY_BEAT_SCHEDULE = {
-    "send_notification": {"task": "users.tasks.send_habit_notification", "schedule": timedelta(minutes=1)}
+    "send_notification": {"task": "users.tasks.send_habit_notification", "schedule": timedelta(minutes=1)},
+    "requeue_stale_deliveries": {"task": "users.tasks.requeue_stale_deliveries", "schedule": timedelta(minutes=5)},
 }
 
+HABIT_NOTIFICATION_CHUNK_SIZE = int(os.getenv('HABIT_NOTIFICATION_CHUNK_SIZE') or 500)
+
+HABIT_NOTIFICATION_CHUNK_TIME_LIMIT = int(os.getenv('HABIT_NOTIFICATION_CHUNK_TIME_LIMIT') or 50)
+
+HABIT_NOTIFICATION_WATERMARK_OVERLAP = int(os.getenv('HABIT_NOTIFICATION_WATERMARK_OVERLAP') or 300)
+
+HABIT_NOTIFICATION_DIGEST = os.getenv('HABIT_NOTIFICATION_DIGEST', '').lower() in ('1', 'true', 'yes')
+
+HABIT_PUBLIC_CACHE_TIMEOUT = int(os.getenv('HABIT_PUBLIC_CACHE_TIMEOUT') or 300)
+
+HABIT_EXPORT_CHUNK_SIZE = int(os.getenv('HABIT_EXPORT_CHUNK_SIZE') or 2000)
+
+HABIT_BULK_MAX_ITEMS = int(os.getenv('HABIT_BULK_MAX_ITEMS') or 500)
+
+HABIT_CALENDAR_CACHE_TIMEOUT = int(os.getenv('HABIT_CALENDAR_CACHE_TIMEOUT') or 3600)
+
 BOT_TOKEN = os.getenv('TG_TOKEN_FOR_BOT')
 TG_URL = os.getenv('TG_URL_FOR_BOT')
+TG_POOL_SIZE = int(os.getenv('TG_POOL_SIZE') or 20)
+TG_MAX_WORKERS = int(os.getenv('TG_MAX_WORKERS') or 20)
+TG_TIMEOUT = int(os.getenv('TG_TIMEOUT') or 10)
+TG_GLOBAL_RATE = int(os.getenv('TG_GLOBAL_RATE') or 30)
+TG_CHAT_RATE = float(os.getenv('TG_CHAT_RATE') or 1)
+TG_MAX_RATE_DELAY = int(os.getenv('TG_MAX_RATE_DELAY') or 40)
+TG_RETRY_BASE_DELAY = int(os.getenv('TG_RETRY_BASE_DELAY') or 5)
+TG_RETRY_MAX_DELAY = int(os.getenv('TG_RETRY_MAX_DELAY') or 300)
+TG_RETRY_MAX_ATTEMPTS = int(os.getenv('TG_RETRY_MAX_ATTEMPTS') or 5)
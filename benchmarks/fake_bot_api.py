@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeBotAPIHandler(BaseHTTPRequestHandler):
+    """ Обработчик запросов локальной заглушки Telegram Bot API """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """ Отвечает на sendMessage как Bot API после заданной задержки """
+        server = self.server
+        params = parse_qs(urlparse(self.path).query)
+        chat_id = params.get('chat_id', [''])[0]
+        time.sleep(server.latency)
+        with server.lock:
+            server.requests_count += 1
+            server.messages.append((params.get('text', [''])[0], chat_id))
+            rate_limited = server.rate_limit_every and server.requests_count % server.rate_limit_every == 0
+        if rate_limited:
+            self.send_json(429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                 'parameters': {'retry_after': server.retry_after}})
+        elif chat_id in server.failing_chat_ids:
+            self.send_json(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'})
+        else:
+            self.send_json(200, {'ok': True, 'result': {'chat': {'id': chat_id}}})
+
+    def send_json(self, status_code, payload):
+        """ Отправляет JSON-ответ с сохранением соединения """
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """ Отключает вывод журнала запросов """
+
+
+class FakeBotAPIServer:
+    """ Локальная заглушка Telegram Bot API для тестов и замеров производительности """
+
+    def __init__(self, latency=0.0, failing_chat_ids=(), rate_limit_every=0, retry_after=1):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), FakeBotAPIHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.failing_chat_ids = {str(chat_id) for chat_id in failing_chat_ids}
+        self.httpd.rate_limit_every = rate_limit_every
+        self.httpd.retry_after = retry_after
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests_count = 0
+        self.httpd.messages = []
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        """ Адрес заглушки в формате TG_URL """
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    @property
+    def requests_count(self):
+        """ Количество обработанных запросов """
+        return self.httpd.requests_count
+
+    @property
+    def messages(self):
+        """ Полученные сообщения (текст, chat_id) """
+        return self.httpd.messages
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
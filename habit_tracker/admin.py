@@ -1,5 +1,5 @@
 from django.contrib import admin
-from habit_tracker.models import Habit
+from habit_tracker.models import Habit, HabitCompletion, NotificationDelivery, SchedulerLease, SchedulerState
 
 
 @admin.register(Habit)
@@ -14,3 +14,26 @@ class HabitAdmin(admin.ModelAdmin):
         return obj.owner.email if obj.owner else "Нет данных"
 
     get_owner_email.short_description = 'E-mail пользователя'
+
+
+@admin.register(HabitCompletion)
+class HabitCompletionAdmin(admin.ModelAdmin):
+    list_display = ('habit', 'date', 'created_at',)
+    ordering = ('-date', 'id',)
+
+
+@admin.register(NotificationDelivery)
+class NotificationDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('habit', 'scheduled_for', 'status', 'attempts', 'sent_at', 'latency',)
+    list_filter = ('status',)
+    ordering = ('-scheduled_for', 'id',)
+
+
+@admin.register(SchedulerState)
+class SchedulerStateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'watermark', 'lag', 'updated_at',)
+
+
+@admin.register(SchedulerLease)
+class SchedulerLeaseAdmin(admin.ModelAdmin):
+    list_display = ('name', 'owner', 'expires_at',)
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class HabitTrackerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "habit_tracker"
+
+    def ready(self):
+        import habit_tracker.signals
+        post_migrate.connect(habit_tracker.signals.restore_search_after_migrate, sender=self)
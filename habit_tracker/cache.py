@@ -0,0 +1,114 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PUBLIC_VERSION_KEY = 'habits:public:version'
+PUBLIC_PAGE_KEY = 'habits:public:page:{version}:{digest}'
+PUBLIC_HITS_KEY = 'habits:public:hits'
+PUBLIC_MISSES_KEY = 'habits:public:misses'
+USER_VERSION_KEY = 'habits:user:{user_id}:version'
+USER_CALENDAR_KEY = 'habits:user:{user_id}:calendar:{version}:{start}:{days}'
+
+
+def new_version_token():
+    """ Формирует новый токен версии из времени и случайной части.
+
+    В отличие от счетчика, токен не повторяется, если ключ версии был вытеснен из кеша и создан заново,
+    поэтому старые записи кеша не могут снова стать актуальными.
+    """
+    return f'{time.time_ns():x}.{uuid.uuid4().hex[:8]}'
+
+
+def get_version(key):
+    """ Возвращает текущий токен версии, создавая его при отсутствии """
+    token = new_version_token()
+    if cache.add(key, token, timeout=None):
+        return token
+    return cache.get(key) or token
+
+
+def bump_version(key):
+    """ Заменяет токен версии, делая недействительными все записи кеша с прежним токеном """
+    cache.set(key, new_version_token(), timeout=None)
+
+
+def increment_counter(key):
+    """ Увеличивает счетчик в кеше, создавая его при отсутствии """
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_public_page_key(request):
+    """ Ключ кеша страницы ленты опубликованных привычек для текущей версии и полного адреса запроса """
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return PUBLIC_PAGE_KEY.format(version=get_version(PUBLIC_VERSION_KEY), digest=digest)
+
+
+def get_public_page(request):
+    """ Возвращает закешированные данные страницы ленты и ключ для сохранения, учитывая попадания и промахи """
+    key = get_public_page_key(request)
+    data = cache.get(key)
+    increment_counter(PUBLIC_MISSES_KEY if data is None else PUBLIC_HITS_KEY)
+    return key, data
+
+
+def set_public_page(key, data):
+    """ Сохраняет данные страницы ленты опубликованных привычек """
+    cache.set(key, data, timeout=settings.HABIT_PUBLIC_CACHE_TIMEOUT)
+
+
+def bump_public_version():
+    """ Сбрасывает кеш ленты опубликованных привычек """
+    bump_version(PUBLIC_VERSION_KEY)
+
+
+def get_public_cache_stats():
+    """ Возвращает количество попаданий и промахов кеша ленты опубликованных привычек """
+    hits, misses = (cache.get(key, 0) for key in (PUBLIC_HITS_KEY, PUBLIC_MISSES_KEY))
+    return {'hits': hits, 'misses': misses}
+
+
+def bump_user_version(user_id):
+    """ Меняет версию привычек пользователя, от которой зависят ETag его списка и его привычек """
+    bump_version(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def get_calendar_key(user_id, start, days):
+    """ Ключ кеша календаря напоминаний пользователя для текущей версии его привычек """
+    version = get_version(USER_VERSION_KEY.format(user_id=user_id))
+    return USER_CALENDAR_KEY.format(user_id=user_id, version=version, start=start.isoformat(), days=days)
+
+
+def get_calendar(key):
+    """ Возвращает закешированный календарь напоминаний """
+    return cache.get(key)
+
+
+def set_calendar(key, data):
+    """ Сохраняет календарь напоминаний """
+    cache.set(key, data, timeout=settings.HABIT_CALENDAR_CACHE_TIMEOUT)
+
+
+def make_etag(*parts):
+    """ Формирует строгий ETag из токенов версий и адреса ресурса """
+    return '"%s"' % hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def get_list_etag(request):
+    """ ETag страницы списка привычек: версия ленты опубликованных привычек и, для пользователя, его версия """
+    parts = [get_version(PUBLIC_VERSION_KEY), request.build_absolute_uri()]
+    if request.user.is_authenticated:
+        parts.append(get_version(USER_VERSION_KEY.format(user_id=request.user.pk)))
+    return make_etag(*parts)
+
+
+def get_habit_etag(request, owner_id):
+    """ ETag привычки: связанная привычка принадлежит тому же владельцу, поэтому достаточно его версии """
+    return make_etag(get_version(USER_VERSION_KEY.format(user_id=owner_id)), request.build_absolute_uri())
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+
+
+BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def parse_boolean(name, value):
+    """ Преобразует значение параметра запроса в логическое """
+    try:
+        return BOOLEAN_VALUES[value.lower()]
+    except KeyError:
+        raise ValidationError({name: 'Допустимые значения: true, false, 1, 0.'})
+
+
+def parse_slot(name, value):
+    """ Преобразует время ЧЧ:ММ из параметра запроса в минуту суток """
+    try:
+        parsed = datetime.strptime(value, '%H:%M')
+    except ValueError:
+        raise ValidationError({name: 'Укажите время в формате ЧЧ:ММ.'})
+    return parsed.hour * 60 + parsed.minute
+
+
+def get_habit_filter(params):
+    """ Формирует условие отбора привычек по параметрам запроса списка.
+
+    Поддерживаются is_pleasant, is_public, place, periodicity и окно времени выполнения time_from/time_to
+    (ЧЧ:ММ), которое проверяется по индексированной минуте суток due_slot и может переходить через полночь.
+    """
+    condition = Q()
+    for name in ('is_pleasant', 'is_public'):
+        if name in params:
+            condition &= Q(**{name: parse_boolean(name, params[name])})
+    if 'place' in params:
+        condition &= Q(place=params['place'])
+    if 'periodicity' in params:
+        try:
+            condition &= Q(periodicity=int(params['periodicity']))
+        except ValueError:
+            raise ValidationError({'periodicity': 'Укажите целое число дней.'})
+    time_from = parse_slot('time_from', params['time_from']) if 'time_from' in params else None
+    time_to = parse_slot('time_to', params['time_to']) if 'time_to' in params else None
+    if time_from is not None and time_to is not None and time_from > time_to:
+        condition &= Q(due_slot__gte=time_from) | Q(due_slot__lte=time_to)
+    else:
+        if time_from is not None:
+            condition &= Q(due_slot__gte=time_from)
+        if time_to is not None:
+            condition &= Q(due_slot__lte=time_to)
+    return condition
+
+
+class HabitOrderingFilter(OrderingFilter):
+    """ Класс сортировки списка привычек по разрешенным полям с добавлением id для однозначного порядка """
+
+    def get_ordering(self, request, queryset, view):
+        """Метод возвращает сортировку, завершающуюся по id."""
+        ordering = list(super().get_ordering(request, queryset, view) or ['id'])
+        if not {'id', '-id'} & set(ordering):
+            ordering.append('id')
+        return ordering
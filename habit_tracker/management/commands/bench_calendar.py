@@ -0,0 +1,68 @@
+import time
+from datetime import time as datetime_time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from habit_tracker import occurrences
+from habit_tracker.cache import get_calendar, get_calendar_key, set_calendar
+from habit_tracker.models import Habit
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Замер построения календаря напоминаний на тестовой базе данных: NumPy, цикл Python и кеш'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=500, help='Количество привычек пользователя')
+        parser.add_argument('--days', type=int, default=366, help='Количество дней календаря')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов, берется лучший')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count):
+        """ Создает привычки пользователя с периодичностью от 1 до 7 дней """
+        user = User.objects.create(email='bench@bench.local')
+        Habit.objects.bulk_create(
+            [Habit(owner=user, name=f'Привычка {number}', place='Место', action='Действие',
+                   date_completion=datetime_time(number % 24, number % 60), periodicity=number % 7 + 1)
+             for number in range(count)],
+            batch_size=1000
+        )
+        return user
+
+    def best(self, run, repeat):
+        """ Возвращает лучшее время из нескольких запусков """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def run(self, options):
+        user = self.seed(options['habits'])
+        start, days, repeat = timezone.localdate(), options['days'], options['repeat']
+        habits = occurrences.get_calendar_habits(user)
+        calendar = occurrences.build_calendar(habits, start, days, vectorized=False)
+        total = sum(map(len, calendar['days'].values()))
+        self.stdout.write(f'Привычек: {len(habits)}, дней: {days}, напоминаний: {total}')
+        modes = [('Python', lambda: occurrences.build_calendar(habits, start, days, vectorized=False))]
+        if occurrences.numpy is not None:
+            modes.append(('NumPy', lambda: occurrences.build_calendar(habits, start, days, vectorized=True)))
+        else:
+            self.stdout.write('NumPy не установлен, векторный вариант пропущен')
+        key = get_calendar_key(user.pk, start, days)
+        set_calendar(key, calendar)
+        modes.append(('Кеш', lambda: get_calendar(get_calendar_key(user.pk, start, days))))
+        for name, run in modes:
+            self.stdout.write(f'{name:<8} {self.best(run, repeat) * 1e3:8.2f} мс')
+        cache.delete(key)
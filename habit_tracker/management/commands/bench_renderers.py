@@ -0,0 +1,46 @@
+import time
+from datetime import time as datetime_time, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from Coursework_6_DRF.renderers import FastJSONRenderer
+from habit_tracker.models import Habit
+from habit_tracker.serializers import HabitSerializer
+
+
+class Command(BaseCommand):
+    help = 'Замер времени рендеринга JSON на 1000 привычек: JSONRenderer и FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=1000, help='Количество привычек на странице')
+        parser.add_argument('--repeat', type=int, default=50, help='Количество повторов')
+        parser.add_argument('--raw', action='store_true',
+                            help='Рендерить необработанные значения time и timedelta вместо вывода сериализатора')
+
+    def page(self, count, raw):
+        """ Формирует страницу привычек без обращения к базе данных """
+        habits = []
+        for number in range(count):
+            related = Habit(id=count + number, name=f'Приятная {number}', is_pleasant=True, place='Место',
+                            action='Действие', date_completion=datetime_time(number % 24, number % 60))
+            habits.append(Habit(id=number, name=f'Привычка {number}', place='Место', action='Действие',
+                                date_completion=datetime_time(number % 24, number % 60), related_habit=related,
+                                execution_time=timedelta(seconds=number % 120 + 1)))
+        if raw:
+            return {'count': count, 'results': [
+                {'id': habit.id, 'name': habit.name, 'date_completion': habit.date_completion,
+                 'execution_time': habit.execution_time} for habit in habits
+            ]}
+        return {'count': count, 'results': HabitSerializer(habits, many=True).data}
+
+    def handle(self, *args, **options):
+        data = self.page(options['habits'], options['raw'])
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                body = renderer.render(data)
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            per_thousand = elapsed / options['habits'] * 1000
+            self.stdout.write(f'{type(renderer).__name__:<18} {per_thousand * 1000:8.2f} ms / 1000 привычек '
+                              f'({len(body)} байт)')
@@ -0,0 +1,65 @@
+import time
+from datetime import time as datetime_time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from habit_tracker.models import Habit
+from habit_tracker.serializers import HabitSerializer, HabitValuesSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Замер сериализации списка привычек на тестовой базе данных: HabitSerializer и быстрый сериализатор'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--habits', type=int, default=10000, help='Количество привычек')
+        parser.add_argument('--repeat', type=int, default=3, help='Количество повторов, берется лучший')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, count):
+        """ Создает привычки, каждая вторая из которых связана с приятной привычкой """
+        user = User.objects.create(email='bench@bench.local')
+        pleasant = Habit.objects.bulk_create(
+            [Habit(owner=user, name=f'Приятная {number}', is_pleasant=True, place='Место', action='Действие',
+                   date_completion=datetime_time(number % 24, number % 60)) for number in range(count // 2)],
+            batch_size=1000
+        )
+        Habit.objects.bulk_create(
+            [Habit(owner=user, name=f'Привычка {number}', related_habit=habit, place='Место', action='Действие',
+                   date_completion=datetime_time(number % 24, number % 60),
+                   execution_time=timedelta(seconds=number % 120)) for number, habit in enumerate(pleasant)],
+            batch_size=1000
+        )
+
+    def best(self, run, repeat):
+        """ Возвращает лучшее время из нескольких запусков """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def run(self, options):
+        self.seed(options['habits'])
+        queryset = Habit.objects.select_related('related_habit').order_by('id')
+        values_serializer = HabitValuesSerializer()
+        rows = len(queryset)
+        modes = [
+            ('HabitSerializer', lambda: HabitSerializer(queryset.all(), many=True).data),
+            ('HabitValuesSerializer',
+             lambda: values_serializer.to_representation(values_serializer.values(queryset.all()))),
+        ]
+        timings = {}
+        for name, run in modes:
+            timings[name] = self.best(run, options['repeat'])
+            self.stdout.write(f'{name:<22} {timings[name]:8.3f} s  {timings[name] / rows * 1e6:8.1f} мкс/строка')
+        self.stdout.write(f'Ускорение: {timings["HabitSerializer"] / timings["HabitValuesSerializer"]:.1f}x')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from habit_tracker.cache import get_public_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Количество попаданий и промахов кеша ленты опубликованных привычек'
+
+    def handle(self, *args, **options):
+        stats = get_public_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(f"hits {stats['hits']}  misses {stats['misses']}  hit ratio {ratio:.1%}")
@@ -0,0 +1,35 @@
+from itertools import groupby
+
+from django.db.models import Exists, OuterRef
+
+from django.core.management.base import BaseCommand
+
+from habit_tracker.models import Habit, HabitCompletion
+from habit_tracker.streaks import compute_streaks
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков выполнения привычек по журналу выполнений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пакета обновления')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        completions = HabitCompletion.objects.order_by('habit_id', 'date').values_list(
+            'habit_id', 'habit__periodicity', 'date'
+        )
+        batch = []
+        repaired = 0
+        for (habit_id, periodicity), rows in groupby(completions.iterator(chunk_size=batch_size),
+                                                     key=lambda row: row[:2]):
+            counters = compute_streaks((date for *_, date in rows), periodicity)
+            batch.append(Habit(pk=habit_id, **counters))
+            if len(batch) == batch_size:
+                repaired += Habit.objects.bulk_update(batch, Habit.COUNTER_FIELDS)
+                batch = []
+        repaired += Habit.objects.bulk_update(batch, Habit.COUNTER_FIELDS)
+        reset = Habit.objects.filter(completions_count__gt=0).exclude(
+            Exists(HabitCompletion.objects.filter(habit=OuterRef('pk')))
+        ).update(completions_count=0, current_streak=0, longest_streak=0, last_completed_on=None)
+        self.stdout.write(f'Пересчитано привычек: {repaired}, сброшено: {reset}')
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+
+def fill_due_slot(apps, schema_editor):
+    Habit = apps.get_model('habit_tracker', 'Habit')
+    Habit.objects.exclude(date_completion=None).update(
+        due_slot=ExtractHour('date_completion') * 60 + ExtractMinute('date_completion')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='due_slot',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Минута суток для напоминания'),
+        ),
+        migrations.RunPython(fill_due_slot, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['due_slot', 'id'], name='habit_due_slot_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+from habit_tracker.scheduling import get_next_fire_at
+
+
+def fill_next_fire_at(apps, schema_editor):
+    Habit = apps.get_model('habit_tracker', 'Habit')
+    batch = []
+    for habit in Habit.objects.exclude(date_completion=None).only('id', 'date_completion').iterator(chunk_size=2000):
+        habit.next_fire_at = get_next_fire_at(habit.date_completion)
+        batch.append(habit)
+        if len(batch) == 2000:
+            Habit.objects.bulk_update(batch, ['next_fire_at'])
+            batch = []
+    Habit.objects.bulk_update(batch, ['next_fire_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0003_habit_due_slot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Ближайшее напоминание'),
+        ),
+        migrations.RunPython(fill_next_fire_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['next_fire_at', 'id'], name='habit_next_fire_at_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0004_habit_next_fire_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_for', models.DateTimeField(verbose_name='Запланированное время напоминания')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('retrying', 'Ожидает повторной отправки'), ('failed', 'Ошибка отправки')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Количество попыток')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='habit_tracker.habit', verbose_name='Привычка')),
+            ],
+            options={
+                'verbose_name': 'Notification delivery',
+                'verbose_name_plural': 'Notification deliveries',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['scheduled_for'], name='delivery_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('habit', 'scheduled_for'), name='unique_habit_delivery_slot')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0005_notificationdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('watermark', models.DateTimeField(verbose_name='Обработано до')),
+                ('lag', models.DurationField(default=datetime.timedelta(0), verbose_name='Отставание последнего запуска')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')),
+            ],
+            options={
+                'verbose_name': 'Scheduler state',
+                'verbose_name_plural': 'Scheduler states',
+            },
+        ),
+    ]
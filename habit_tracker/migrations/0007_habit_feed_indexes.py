@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0006_schedulerstate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['owner', 'id'], name='habit_owner_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['id'], name='habit_public_id_idx'),
+        ),
+    ]
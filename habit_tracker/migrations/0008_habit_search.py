@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from habit_tracker.search import install_search, uninstall_search
+
+
+def forwards(apps, schema_editor):
+    install_search(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_search(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habit_tracker", "0007_habit_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
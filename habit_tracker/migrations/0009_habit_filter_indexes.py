@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0008_habit_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['owner', 'place', 'id'], name='habit_owner_place_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['owner', 'due_slot', 'id'], name='habit_owner_due_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['place', 'id'], name='habit_public_place_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['due_slot', 'id'], name='habit_public_due_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['periodicity', 'id'], name='habit_public_periodicity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['is_pleasant', 'id'], name='habit_public_pleasant_idx'),
+        ),
+    ]
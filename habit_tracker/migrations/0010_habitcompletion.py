@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0009_habit_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='completions_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество выполнений'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='current_streak',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Текущая серия выполнений'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='last_completed_on',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Дата последнего выполнения'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='longest_streak',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Самая длинная серия выполнений'),
+        ),
+        migrations.CreateModel(
+            name='HabitCompletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата выполнения')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completions', to='habit_tracker.habit', verbose_name='Привычка')),
+            ],
+            options={
+                'verbose_name': 'Habit completion',
+                'verbose_name_plural': 'Habit completions',
+                'constraints': [models.UniqueConstraint(fields=('habit', 'date'), name='unique_habit_completion_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0010_habitcompletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationdelivery',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата захвата для отправки'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationdelivery',
+            index=models.Index(condition=models.Q(('status', 'sending')), fields=['claimed_at'], name='delivery_sending_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0011_notificationdelivery_claimed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('owner', models.CharField(max_length=255, verbose_name='Экземпляр-лидер')),
+                ('expires_at', models.DateTimeField(verbose_name='Аренда действует до')),
+            ],
+            options={
+                'verbose_name': 'Scheduler lease',
+                'verbose_name_plural': 'Scheduler leases',
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habit_tracker', '0012_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notificationdelivery',
+            name='delivery_sending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notificationdelivery',
+            index=models.Index(condition=models.Q(('status__in', ['sending', 'retrying'])), fields=['claimed_at'], name='delivery_claimed_idx'),
+        ),
+    ]
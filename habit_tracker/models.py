@@ -1,14 +1,213 @@
-from datetime import timedelta
+from datetime import time, timedelta
 from django.db import models
+from django.db.models.functions import ExtractHour, ExtractMinute
+from habit_tracker.scheduling import get_next_fire_at
 from users.models import User
 
 
+def get_due_slot(value):
+    """Функция возвращает номер минуты суток (0-1439) для времени выполнения привычки."""
+
+    if value is None:
+        return None
+    if hasattr(value, 'resolve_expression'):
+        return ExtractHour(value) * 60 + ExtractMinute(value)
+    if not isinstance(value, time):
+        value = models.TimeField().to_python(value)
+    return value.hour * 60 + value.minute
+
+
+class HabitFeed:
+    """Класс ленты привычек, объединяющей несколько непересекающихся потоков привычек.
+
+    Вместо условия OR, которое не использует индексы, строки выбираются объединением потоков. Сортировка,
+    условия курсора и граница страницы передаются в каждый поток, поэтому страница читает из каждого индекса
+    не больше строк, чем нужно до ее конца, а не все строки потоков. Столбцы, связанные объекты и
+    сортировка применяются к внешнему запросу. Поддерживаются операции, которые выполняют над списком
+    сортировка, пагинаторы и сериализаторы.
+    """
+
+    def __init__(self, queryset, branches, ordering=('id',)):
+        self.queryset = queryset
+        self.branches = tuple(branches)
+        self.ordering = tuple(ordering)
+        self.model = queryset.model
+        self.db = queryset.db
+
+    def clone(self, queryset=None, branches=None, ordering=None):
+        """Метод возвращает копию ленты с замененными частями."""
+
+        return HabitFeed(self.queryset if queryset is None else queryset,
+                         self.branches if branches is None else branches,
+                         self.ordering if ordering is None else ordering)
+
+    @property
+    def ordered(self):
+        """Признак заданной сортировки (лента всегда упорядочена)."""
+
+        return True
+
+    @property
+    def query(self):
+        """Запрос всей ленты."""
+
+        return self.get_queryset().query
+
+    def order_by(self, *ordering):
+        """Метод задает сортировку потоков и внешнего запроса."""
+
+        return self.clone(ordering=ordering or ('id',))
+
+    def filter(self, *args, **kwargs):
+        """Метод добавляет условие (например, позицию курсора) в каждый поток."""
+
+        return self.clone(branches=[branch.filter(*args, **kwargs) for branch in self.branches])
+
+    def values(self, *fields, **expressions):
+        """Метод задает столбцы строк ленты."""
+
+        return self.clone(queryset=self.queryset.values(*fields, **expressions))
+
+    def values_list(self, *fields, **kwargs):
+        """Метод задает столбцы строк ленты в виде кортежей."""
+
+        return self.clone(queryset=self.queryset.values_list(*fields, **kwargs))
+
+    def select_related(self, *fields):
+        """Метод присоединяет связанные объекты во внешнем запросе."""
+
+        return self.clone(queryset=self.queryset.select_related(*fields))
+
+    def only(self, *fields):
+        """Метод ограничивает загружаемые поля во внешнем запросе."""
+
+        return self.clone(queryset=self.queryset.only(*fields))
+
+    def get_queryset(self, limit=None):
+        """Метод возвращает запрос ленты, в котором каждый поток отсортирован и ограничен limit строками."""
+
+        return self.queryset.filter(pk__in=self.get_ids(limit)).order_by(*self.ordering)
+
+    def get_ids(self, limit=None):
+        """Метод возвращает объединение идентификаторов потоков (каждый поток ограничен limit строками)."""
+
+        ids = None
+        for branch in self.branches:
+            branch_ids = branch.order_by().values('id')
+            if limit is not None:
+                # SQLite не допускает ORDER BY и LIMIT в частях UNION, поэтому поток оборачивается в подзапрос
+                branch_ids = self.model.objects.filter(
+                    pk__in=branch.order_by(*self.ordering).values('id')[:limit]
+                ).values('id')
+            ids = branch_ids if ids is None else ids.union(branch_ids, all=True)
+        return ids
+
+    def count(self):
+        """Метод возвращает количество привычек ленты: потоки не пересекаются, поэтому объединяются без DISTINCT."""
+
+        return self.get_ids().count()
+
+    def exists(self):
+        """Метод проверяет, есть ли в ленте хотя бы одна привычка."""
+
+        return any(branch.exists() for branch in self.branches)
+
+    def iterator(self, chunk_size=None):
+        """Метод читает всю ленту порциями."""
+
+        return self.get_queryset().iterator(chunk_size=chunk_size)
+
+    def explain(self, **options):
+        """Метод возвращает план запроса всей ленты."""
+
+        return self.get_queryset().explain(**options)
+
+    def __getitem__(self, k):
+        """Метод возвращает срез ленты запросом с границей страницы в каждом потоке или одну привычку."""
+
+        if isinstance(k, slice):
+            return self.get_queryset(limit=k.stop)[k]
+        if k < 0:
+            raise ValueError('Отрицательные индексы не поддерживаются.')
+        return self.get_queryset(limit=k + 1)[k]
+
+    def __iter__(self):
+        return iter(self.get_queryset())
+
+    def __len__(self):
+        return len(self.get_queryset())
+
+
+class HabitQuerySet(models.QuerySet):
+    """Класс набора запросов модели "Привычки", поддерживающий расписание напоминаний при массовых операциях."""
+
+    def visible_to(self, user, condition=None):
+        """Метод возвращает привычки пользователя и опубликованные привычки, отобранные по условию condition.
+
+        Для пользователя возвращается лента HabitFeed из двух непересекающихся индексных потоков: его привычек
+        и чужих опубликованных. Условие отбора применяется в каждом потоке, чтобы оно тоже выполнялось по индексу.
+        """
+
+        condition = condition or models.Q()
+        if not user.is_authenticated:
+            return self.filter(condition, is_public=True)
+        owned = self.model.objects.filter(condition, owner=user)
+        public = self.model.objects.filter(condition, is_public=True).exclude(owner=user)
+        return HabitFeed(self.all(), (owned, public))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Метод массового создания привычек с расчетом расписания напоминаний."""
+
+        objs = list(objs)
+        for obj in objs:
+            obj.refresh_schedule()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Метод массового изменения привычек с пересчетом расписания напоминаний."""
+
+        objs = list(objs)
+        if {'date_completion', 'periodicity'} & set(fields) and 'due_slot' not in fields:
+            for obj in objs:
+                obj.refresh_schedule()
+            fields = [*fields, 'due_slot', 'next_fire_at']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        """Метод изменения привычек запросом с пересчетом расписания напоминаний.
+
+        Если время выполнения задано выражением или изменена периодичность, ближайшее напоминание
+        пересчитывается для измененных привычек дополнительным запросом.
+        """
+
+        date_completion = kwargs.get('date_completion')
+        refresh = 'next_fire_at' not in kwargs and (
+            hasattr(date_completion, 'resolve_expression') or 'periodicity' in kwargs
+        )
+        if 'date_completion' in kwargs and 'due_slot' not in kwargs:
+            kwargs['due_slot'] = get_due_slot(date_completion)
+            if not refresh and 'next_fire_at' not in kwargs:
+                kwargs['next_fire_at'] = get_next_fire_at(date_completion)
+        if not refresh:
+            return super().update(**kwargs)
+        pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        habits = list(self.model.objects.filter(pk__in=pks).only('id', 'date_completion'))
+        for habit in habits:
+            habit.next_fire_at = get_next_fire_at(habit.date_completion)
+        self.model.objects.bulk_update(habits, ['next_fire_at'], batch_size=1000)
+        return rows
+
+
 class Habit(models.Model):
     """ Habit model """
     name = models.CharField(max_length=200, verbose_name='Наименование привычки', blank=True, null=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Создатель привычки', blank=True, null=True)
     place = models.CharField(max_length=100, verbose_name='Место', blank=True, null=True)
     date_completion = models.TimeField(verbose_name='Дата начала выполнения', blank=True, null=True)
+    due_slot = models.PositiveSmallIntegerField(verbose_name='Минута суток для напоминания', editable=False,
+                                                blank=True, null=True)
+    next_fire_at = models.DateTimeField(verbose_name='Ближайшее напоминание', editable=False, blank=True, null=True)
     action = models.CharField(max_length=200, verbose_name='Действие', blank=True, null=True)
     is_pleasant = models.BooleanField(default=False, verbose_name='Приятная привычка')
     related_habit = models.ForeignKey('self', on_delete=models.SET_NULL, verbose_name='Связанная привычка',
@@ -17,12 +216,166 @@ class Habit(models.Model):
     award = models.CharField(max_length=100, verbose_name='Вознаграждение', blank=True, null=True)
     execution_time = models.DurationField(default=timedelta(seconds=120), verbose_name='Требуется времени')
     is_public = models.BooleanField(default=False, verbose_name='Привычка опубликована')
+    completions_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество выполнений')
+    current_streak = models.PositiveIntegerField(default=0, editable=False, verbose_name='Текущая серия выполнений')
+    longest_streak = models.PositiveIntegerField(default=0, editable=False,
+                                                 verbose_name='Самая длинная серия выполнений')
+    last_completed_on = models.DateField(editable=False, blank=True, null=True,
+                                         verbose_name='Дата последнего выполнения')
+
+    objects = HabitQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('completions_count', 'current_streak', 'longest_streak', 'last_completed_on')
 
     class Meta:
         verbose_name = 'Habit'
         verbose_name_plural = 'Habits'
+        indexes = [
+            models.Index(fields=['due_slot', 'id'], name='habit_due_slot_idx'),
+            models.Index(fields=['next_fire_at', 'id'], name='habit_next_fire_at_idx'),
+            models.Index(fields=['owner', 'id'], name='habit_owner_id_idx'),
+            models.Index(fields=['id'], condition=models.Q(is_public=True), name='habit_public_id_idx'),
+            models.Index(fields=['owner', 'place', 'id'], name='habit_owner_place_idx'),
+            models.Index(fields=['owner', 'due_slot', 'id'], name='habit_owner_due_slot_idx'),
+            models.Index(fields=['place', 'id'], condition=models.Q(is_public=True), name='habit_public_place_idx'),
+            models.Index(fields=['due_slot', 'id'], condition=models.Q(is_public=True),
+                         name='habit_public_due_slot_idx'),
+            models.Index(fields=['periodicity', 'id'], condition=models.Q(is_public=True),
+                         name='habit_public_periodicity_idx'),
+            models.Index(fields=['is_pleasant', 'id'], condition=models.Q(is_public=True),
+                         name='habit_public_pleasant_idx'),
+        ]
 
     def __str__(self):
         if self.owner:
             return f'{self.owner.email} - {self.action} - {self.place} - {self.date_completion}'
         return f'No owner - {self.action} - {self.place} - {self.date_completion}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Метод загрузки привычки из базы данных с запоминанием сохраненного расписания, публикации и владельца."""
+
+        instance = super().from_db(db, field_names, values)
+        instance._saved_due_slot = instance.__dict__.get('due_slot')
+        instance._saved_periodicity = instance.__dict__.get('periodicity')
+        instance._saved_is_public = instance.__dict__.get('is_public', True)
+        instance._saved_owner_id = instance.__dict__.get('owner_id')
+        return instance
+
+    def refresh_schedule(self):
+        """Метод пересчитывает слот и ближайшее напоминание, если изменилось время выполнения или периодичность."""
+
+        self.due_slot = get_due_slot(self.date_completion)
+        if (self.next_fire_at is None or self.due_slot != getattr(self, '_saved_due_slot', None)
+                or self.periodicity != getattr(self, '_saved_periodicity', None)):
+            self.next_fire_at = get_next_fire_at(self.date_completion)
+        self._saved_due_slot = self.due_slot
+        self._saved_periodicity = self.periodicity
+
+    def save(self, *args, **kwargs):
+        """Метод сохранения привычки с расчетом расписания напоминаний."""
+
+        self.refresh_schedule()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date_completion', 'periodicity'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'due_slot', 'next_fire_at'}
+        super().save(*args, **kwargs)
+
+
+class NotificationDelivery(models.Model):
+    """Класс модели "Отправка напоминания": журнал доставки напоминания о привычке за конкретный слот."""
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    RETRYING = 'retrying'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает отправки'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (RETRYING, 'Ожидает повторной отправки'),
+        (FAILED, 'Ошибка отправки'),
+    ]
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='deliveries', verbose_name='Привычка')
+    scheduled_for = models.DateTimeField(verbose_name='Запланированное время напоминания')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Количество попыток')
+    error = models.TextField(blank=True, null=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    claimed_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата захвата для отправки')
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки')
+
+    class Meta:
+        verbose_name = 'Notification delivery'
+        verbose_name_plural = 'Notification deliveries'
+        constraints = [
+            models.UniqueConstraint(fields=['habit', 'scheduled_for'], name='unique_habit_delivery_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['scheduled_for'], condition=models.Q(status='pending'),
+                         name='delivery_pending_idx'),
+            models.Index(fields=['claimed_at'], condition=models.Q(status__in=['sending', 'retrying']),
+                         name='delivery_claimed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.habit_id} - {self.scheduled_for} - {self.status}'
+
+    @property
+    def latency(self):
+        """Задержка фактической отправки относительно запланированного времени."""
+
+        if self.sent_at is None:
+            return None
+        return self.sent_at - self.scheduled_for
+
+
+class HabitCompletion(models.Model):
+    """Класс модели "Выполнение привычки": отметка о выполнении привычки за день."""
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='completions', verbose_name='Привычка')
+    date = models.DateField(verbose_name='Дата выполнения')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Habit completion'
+        verbose_name_plural = 'Habit completions'
+        constraints = [
+            models.UniqueConstraint(fields=['habit', 'date'], name='unique_habit_completion_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.habit_id} - {self.date}'
+
+
+class SchedulerState(models.Model):
+    """Класс модели "Состояние планировщика": отметка времени, до которой обработаны напоминания."""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name='Название')
+    watermark = models.DateTimeField(verbose_name='Обработано до')
+    lag = models.DurationField(default=timedelta(0), verbose_name='Отставание последнего запуска')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата последнего изменения')
+
+    class Meta:
+        verbose_name = 'Scheduler state'
+        verbose_name_plural = 'Scheduler states'
+
+    def __str__(self):
+        return f'{self.name} - {self.watermark}'
+
+
+class SchedulerLease(models.Model):
+    """Класс модели "Аренда лидерства": экземпляр планировщика, который сейчас отправляет периодические задачи."""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name='Название')
+    owner = models.CharField(max_length=255, verbose_name='Экземпляр-лидер')
+    expires_at = models.DateTimeField(verbose_name='Аренда действует до')
+
+    class Meta:
+        verbose_name = 'Scheduler lease'
+        verbose_name_plural = 'Scheduler leases'
+
+    def __str__(self):
+        return f'{self.name} - {self.owner} - {self.expires_at}'
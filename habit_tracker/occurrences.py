@@ -0,0 +1,97 @@
+from datetime import date
+
+from django.utils import timezone
+
+from habit_tracker.models import Habit
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def get_calendar_habits(user):
+    """ Функция возвращает привычки пользователя с расписанием в порядке времени выполнения """
+    return list(
+        Habit.objects.filter(owner=user, next_fire_at__isnull=False)
+        .order_by('date_completion', 'id')
+        .values_list('id', 'name', 'date_completion', 'periodicity', 'next_fire_at')
+    )
+
+
+def get_first_offsets(anchors, periods, start):
+    """ Функция возвращает номер первого дня серии каждой привычки не раньше start (в днях от start).
+
+    Дни напоминаний привычки - это anchor + k * period для любого целого k, поэтому сдвиг next_fire_at
+    планировщиком на целое число периодов не меняет календарь.
+    """
+    return (anchors - start) % periods
+
+
+def expand_numpy(anchors, periods, start, end):
+    """ Функция раскрывает расписания всех привычек в дни напоминаний одним векторным проходом NumPy.
+
+    Возвращает упорядоченные по дню порядковые номера дней и индексы привычек (в пределах дня - в исходном порядке).
+    """
+    anchors = numpy.asarray(anchors, dtype=numpy.int64)
+    periods = numpy.asarray(periods, dtype=numpy.int64)
+    first = get_first_offsets(anchors, periods, start)
+    counts = numpy.where(first <= end - start, (end - start - first) // periods + 1, 0)
+    habits = numpy.repeat(numpy.arange(len(anchors)), counts)
+    steps = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    days = start + first[habits] + steps * periods[habits]
+    order = numpy.lexsort((habits, days))
+    return days[order], habits[order]
+
+
+def expand_python(anchors, periods, start, end):
+    """ Функция раскрывает расписания привычек в дни напоминаний без NumPy, с тем же результатом """
+    by_day = {}
+    for index, (anchor, period) in enumerate(zip(anchors, periods)):
+        for day in range(start + get_first_offsets(anchor, period, start), end + 1, period):
+            by_day.setdefault(day, []).append(index)
+    days, habits = [], []
+    for day in sorted(by_day):
+        days.extend([day] * len(by_day[day]))
+        habits.extend(by_day[day])
+    return days, habits
+
+
+def group_by_day(days, habit_ids):
+    """ Функция группирует идентификаторы привычек по дням в словарь {дата ISO: [id, ...]} """
+    if numpy is not None and isinstance(days, numpy.ndarray):
+        if not len(days):
+            return {}
+        unique, starts = numpy.unique(days, return_index=True)
+        groups = numpy.split(habit_ids, starts[1:])
+        return {date.fromordinal(int(day)).isoformat(): group.tolist() for day, group in zip(unique, groups)}
+    calendar = {}
+    for day, habit_id in zip(days, habit_ids):
+        calendar.setdefault(day, []).append(habit_id)
+    return {date.fromordinal(day).isoformat(): ids for day, ids in calendar.items()}
+
+
+def build_calendar(habits, start, days, vectorized=None):
+    """ Функция строит календарь напоминаний привычек на days дней начиная с start.
+
+    Привычки - строки get_calendar_habits. По умолчанию используется NumPy, если он установлен.
+    """
+    vectorized = numpy is not None if vectorized is None else vectorized
+    first_day = start.toordinal()
+    last_day = first_day + days - 1
+    anchors = [timezone.localtime(fire_at).date().toordinal() for *_, fire_at in habits]
+    periods = [max(periodicity or 1, 1) for _, _, _, periodicity, _ in habits]
+    expand = expand_numpy if vectorized else expand_python
+    day_numbers, indexes = expand(anchors, periods, first_day, last_day)
+    ids = [habit_id for habit_id, *_ in habits]
+    habit_ids = numpy.asarray(ids, dtype=numpy.int64)[indexes] if vectorized else [ids[index] for index in indexes]
+    return {
+        'start': start.isoformat(),
+        'end': date.fromordinal(last_day).isoformat(),
+        'habits': [
+            {'id': habit_id, 'name': name, 'date_completion': date_completion and date_completion.isoformat(),
+             'periodicity': periodicity}
+            for habit_id, name, date_completion, periodicity, _ in habits
+        ],
+        'days': group_by_day(day_numbers, habit_ids),
+    }
@@ -1,7 +1,143 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core import signing
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from habit_tracker.search import search_public_habits
+
+
+def estimate_count(queryset):
+    """Функция возвращает оценку количества строк запроса по статистике планировщика PostgreSQL.
+
+    Для других СУБД возвращает None.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
 
 
 class HabitsPaginator(PageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 10
+
+
+class HabitsCursorPaginator(CursorPagination):
+    """Класс пагинации по курсору (по id) без COUNT(*) и OFFSET: любая страница стоит как первая.
+
+    Курсор подписан и непрозрачен для клиента. Оценка общего количества добавляется по параметру estimate.
+    """
+
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    ordering = 'id'
+    cursor_salt = 'habit_tracker.paginators.HabitsCursorPaginator'
+    estimate_query_param = 'estimate'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Метод формирует страницу и при запросе оценивает общее количество строк."""
+
+        self.estimated_count = None
+        if request.query_params.get(self.estimate_query_param) in ('1', 'true'):
+            self.estimated_count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        """Метод возвращает сортировку по id: сортировка по другим полям доступна при постраничной выдаче."""
+
+        return (self.ordering,)
+
+    def decode_cursor(self, request):
+        """Метод проверяет подпись курсора и восстанавливает его."""
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            offset, reverse, position = signing.loads(encoded, salt=self.cursor_salt)
+            return Cursor(offset=max(min(int(offset), self.offset_cutoff), 0), reverse=bool(reverse),
+                          position=position)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        """Метод подписывает курсор и возвращает ссылку на страницу."""
+
+        encoded = signing.dumps([cursor.offset, int(cursor.reverse), cursor.position], salt=self.cursor_salt,
+                                compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        """Метод формирует ответ со ссылками на соседние страницы."""
+
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.estimated_count is not None:
+            response['estimated_count'] = self.estimated_count
+        return Response(response)
+
+
+class HabitsSearchPaginator(BasePagination):
+    """Класс пагинации результатов поиска по подписанному курсору (ранг, id)."""
+
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    cursor_query_param = 'cursor'
+    cursor_salt = 'habit_tracker.paginators.HabitsSearchPaginator'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        """Метод возвращает размер страницы из параметров запроса в допустимых пределах."""
+
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        """Метод проверяет подпись курсора и возвращает позицию (ранг, id)."""
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            rank, habit_id = signing.loads(encoded, salt=self.cursor_salt)
+            return float(rank), int(habit_id)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_search(self, text, request):
+        """Метод выполняет поиск и возвращает страницу позиций (ранг, id)."""
+
+        page_size = self.get_page_size(request)
+        rows = search_public_habits(text, after=self.decode_cursor(request), limit=page_size + 1)
+        self.base_url = request.build_absolute_uri()
+        self.next_position = rows[page_size - 1] if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_next_link(self):
+        """Метод возвращает ссылку на следующую страницу."""
+
+        if self.next_position is None:
+            return None
+        encoded = signing.dumps(list(self.next_position), salt=self.cursor_salt)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        """Метод формирует ответ со ссылкой на следующую страницу."""
+
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -0,0 +1,39 @@
+from datetime import datetime, time, timedelta
+from django.db import models
+from django.utils import timezone
+
+
+def get_next_fire_at(date_completion, after=None):
+    """Функция возвращает ближайший момент напоминания о привычке после указанного момента (по умолчанию - сейчас).
+
+    Время выполнения привычки хранится в местном времени проекта (TIME_ZONE).
+    """
+
+    if date_completion is None:
+        return None
+    if not isinstance(date_completion, time):
+        date_completion = models.TimeField().to_python(date_completion)
+    after = timezone.localtime(after or timezone.now())
+    fire_at = timezone.make_aware(datetime.combine(after.date(), date_completion.replace(tzinfo=None)))
+    if fire_at <= after:
+        fire_at = timezone.make_aware(datetime.combine(after.date() + timedelta(days=1),
+                                                       date_completion.replace(tzinfo=None)))
+    return fire_at
+
+
+def advance_fire_at(fire_at, periodicity, now=None):
+    """Функция сдвигает момент напоминания на целое число периодов (в днях), чтобы он оказался позже now."""
+
+    now = now or timezone.now()
+    periodicity = max(periodicity or 1, 1)
+    local_fire_at = timezone.localtime(fire_at)
+    days_behind = (timezone.localtime(now).date() - local_fire_at.date()).days
+    periods = max(days_behind // periodicity, 0) + 1
+    while True:
+        next_fire_at = timezone.make_aware(
+            datetime.combine(local_fire_at.date() + timedelta(days=periods * periodicity),
+                             local_fire_at.time())
+        )
+        if next_fire_at > now:
+            return next_fire_at
+        periods += 1
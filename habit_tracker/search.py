@@ -0,0 +1,148 @@
+import re
+
+from django.db import NotSupportedError, connections
+
+
+POSTGRES_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """ALTER TABLE habit_tracker_habit ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', COALESCE(name, '')), 'A')
+        || setweight(to_tsvector('russian', COALESCE(action, '')), 'B')
+        || setweight(to_tsvector('russian', COALESCE(place, '')), 'C')
+    ) STORED""",
+    'CREATE INDEX IF NOT EXISTS habit_search_vector_idx ON habit_tracker_habit USING GIN (search_vector)',
+    'CREATE INDEX IF NOT EXISTS habit_place_trgm_idx ON habit_tracker_habit USING GIN (place gin_trgm_ops)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS habit_place_trgm_idx',
+    'DROP INDEX IF EXISTS habit_search_vector_idx',
+    'ALTER TABLE habit_tracker_habit DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_INSTALL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS habit_tracker_habit_fts USING fts5(
+        name, action, place, content='habit_tracker_habit', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS habit_tracker_habit_fts_insert AFTER INSERT ON habit_tracker_habit BEGIN
+        INSERT INTO habit_tracker_habit_fts (rowid, name, action, place)
+        VALUES (new.id, new.name, new.action, new.place);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS habit_tracker_habit_fts_delete AFTER DELETE ON habit_tracker_habit BEGIN
+        INSERT INTO habit_tracker_habit_fts (habit_tracker_habit_fts, rowid, name, action, place)
+        VALUES ('delete', old.id, old.name, old.action, old.place);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS habit_tracker_habit_fts_update
+    AFTER UPDATE OF name, action, place ON habit_tracker_habit BEGIN
+        INSERT INTO habit_tracker_habit_fts (habit_tracker_habit_fts, rowid, name, action, place)
+        VALUES ('delete', old.id, old.name, old.action, old.place);
+        INSERT INTO habit_tracker_habit_fts (rowid, name, action, place)
+        VALUES (new.id, new.name, new.action, new.place);
+    END""",
+    "INSERT INTO habit_tracker_habit_fts (habit_tracker_habit_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS habit_tracker_habit_fts_update',
+    'DROP TRIGGER IF EXISTS habit_tracker_habit_fts_delete',
+    'DROP TRIGGER IF EXISTS habit_tracker_habit_fts_insert',
+    'DROP TABLE IF EXISTS habit_tracker_habit_fts',
+]
+
+INSTALL = {'postgresql': POSTGRES_INSTALL, 'sqlite': SQLITE_INSTALL}
+
+POSTGRES_SEARCH = """
+    SELECT rank, id FROM (
+        SELECT habit.id, GREATEST(ts_rank(habit.search_vector, search.query),
+                                  similarity(COALESCE(habit.place, ''), %s)) AS rank
+        FROM habit_tracker_habit habit, websearch_to_tsquery('russian', %s) AS search (query)
+        WHERE habit.is_public AND (habit.search_vector @@ search.query OR habit.place %% %s)
+    ) ranked
+"""
+
+SQLITE_SEARCH = """
+    SELECT rank, id FROM (
+        SELECT habit.id AS id, -bm25(habit_tracker_habit_fts, 10.0, 5.0, 1.0) AS rank
+        FROM habit_tracker_habit_fts JOIN habit_tracker_habit habit ON habit.id = habit_tracker_habit_fts.rowid
+        WHERE habit_tracker_habit_fts MATCH %s AND habit.is_public
+    ) ranked
+"""
+
+
+def install_search(schema_editor):
+    """ Создает поисковый индекс привычек: в PostgreSQL - вычисляемый столбец tsvector с GIN-индексом
+    и триграммный индекс места, в SQLite - таблицу FTS5 с триггерами.
+
+    Операции идемпотентны, поэтому функцию повторно вызывает restore_search после каждой миграции.
+    """
+    statements = INSTALL.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+SQLITE_TRIGGERS = ['habit_tracker_habit_fts_insert', 'habit_tracker_habit_fts_delete', 'habit_tracker_habit_fts_update']
+
+
+def restore_search(using='default'):
+    """ Восстанавливает поисковый индекс привычек, если он установлен миграцией, но поврежден.
+
+    SQLite пересоздает таблицу привычек при многих изменениях схемы, и триггеры FTS5 удаляются вместе
+    со старой таблицей. Тогда триггеры создаются заново, а индекс перестраивается по текущим данным.
+    Возвращает True, если индекс восстанавливался.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+                           ['habit_tracker_habit_fts%'])
+            names = {name for name, in cursor.fetchall()}
+            if 'habit_tracker_habit_fts' not in names or names.issuperset(SQLITE_TRIGGERS):
+                return False
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s',
+                           ['habit_tracker_habit', 'search_vector'])
+            if cursor.fetchone() is None:
+                return False
+        else:
+            return False
+        for statement in INSTALL[connection.vendor]:
+            cursor.execute(statement)
+    return True
+
+
+def uninstall_search(schema_editor):
+    """ Удаляет поисковый индекс привычек """
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def get_fts5_query(text):
+    """ Преобразует текст запроса в запрос FTS5: все слова с поиском по префиксу """
+    return ' '.join('"%s"*' % word for word in re.findall(r'\w+', text))
+
+
+def search_public_habits(text, after=None, limit=10, using='default'):
+    """ Возвращает список (ранг, id) опубликованных привычек, найденных по названию, действию или месту.
+
+    Результаты упорядочены по убыванию ранга и возрастанию id, after - позиция (ранг, id), после которой
+    начинается страница.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        sql, params = POSTGRES_SEARCH, [text, text, text]
+    elif connection.vendor == 'sqlite':
+        query = get_fts5_query(text)
+        if not query:
+            return []
+        sql, params = SQLITE_SEARCH, [query]
+    else:
+        raise NotSupportedError(f'Поиск привычек не поддерживается для {connection.vendor}')
+    if after is not None:
+        sql += ' WHERE rank < %s OR (rank = %s AND id > %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank DESC, id LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tuple(row) for row in cursor.fetchall()]
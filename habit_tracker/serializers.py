@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from django.utils import timezone
 from habit_tracker.models import Habit
 from habit_tracker.validators import RewardOrRelatedValidator, ExecutionTimeValidator, PleasantRelatedValidator, \
     PleasantHabitValidator, FrequencyValidator, RelatedPublicValidator, RelatedOwnerValidator
 from datetime import timedelta
+from functools import lru_cache
+from habit_tracker.streaks import get_current_streak
 
 
 class RelatedHabitSerializer(serializers.ModelSerializer):
@@ -11,7 +14,10 @@ class RelatedHabitSerializer(serializers.ModelSerializer):
     class Meta:
         """Класс для изменения поведения полей сериализатора связанной привычки модели "Привычки"."""
         model = Habit
-        fields = '__all__'
+        fields = [
+            'id', 'name', 'place', 'date_completion', 'action', 'is_pleasant', 'periodicity',
+            'award', 'execution_time', 'is_public', 'owner', 'related_habit'
+        ]
 
 
 class DurationFieldInSeconds(serializers.DurationField):
@@ -61,6 +67,7 @@ class HabitSerializer(serializers.ModelSerializer):
             'periodicity', 'award', 'execution_time', 'is_public', 'owner',
             'related_habit', 'related_habit_id'
         ]
+        read_only_fields = ['owner']
         validators = [
             RewardOrRelatedValidator('is_pleasant', 'related_habit', 'award'),
             ExecutionTimeValidator('execution_time'),
@@ -70,3 +77,214 @@ class HabitSerializer(serializers.ModelSerializer):
             RelatedPublicValidator('related_habit', 'is_public'),
             RelatedOwnerValidator('related_habit', 'owner')
         ]
+
+    def __init__(self, *args, **kwargs):
+        """Метод оставляет только поля из context['sparse_fields'] = (поля, раскрываемые поля), если он передан."""
+        super().__init__(*args, **kwargs)
+        fields, expand = self.context.get('sparse_fields', (None, frozenset()))
+        if fields is None:
+            return
+        for name, field in list(self.fields.items()):
+            if not field.write_only and name not in fields:
+                self.fields.pop(name)
+        for name, field in list(self.fields.items()):
+            if isinstance(field, serializers.BaseSerializer) and name not in expand:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    def to_internal_value(self, data):
+        """Метод подставляет текущего пользователя владельцем до запуска цепочки проверок.
+
+        Представления сохраняют привычку с владельцем - текущим пользователем и изменяют только его привычки,
+        поэтому проверка связанной привычки выполняется для того же владельца.
+        """
+        attrs = super().to_internal_value(data)
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            attrs['owner'] = request.user
+        return attrs
+
+    def update(self, instance, validated_data):
+        """Метод сохраняет только переданные поля привычки.
+
+        Счетчики выполнений могут измениться отметкой выполнения между загрузкой привычки и ее сохранением,
+        поэтому полное сохранение перезаписало бы их загруженными ранее значениями.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class HabitCompletionSerializer(serializers.Serializer):
+    """ Класс сериализатора отметки о выполнении привычки. """
+    date = serializers.DateField(default=timezone.localdate, help_text='Дата выполнения, по умолчанию - сегодня')
+
+    def validate_date(self, value):
+        """Метод запрещает отмечать выполнение в будущем."""
+        if value > timezone.localdate():
+            raise serializers.ValidationError('Нельзя отметить выполнение привычки в будущем.')
+        return value
+
+
+class HabitCalendarParamsSerializer(serializers.Serializer):
+    """ Класс сериализатора параметров календаря напоминаний. """
+    start = serializers.DateField(default=timezone.localdate, help_text='Первый день календаря, по умолчанию - сегодня')
+    days = serializers.IntegerField(default=90, min_value=1, max_value=366, help_text='Количество дней календаря')
+
+    def validate_start(self, value):
+        """Метод запрещает календарь с прошедших дней: расписание строится только вперед."""
+        if value < timezone.localdate():
+            raise serializers.ValidationError('Календарь строится начиная с сегодняшнего дня.')
+        return value
+
+
+class HabitStreakSerializer(serializers.ModelSerializer):
+    """ Класс сериализатора счетчиков выполнения привычки (только для чтения). """
+    current_streak = serializers.SerializerMethodField()
+
+    class Meta:
+        """Класс для изменения поведения полей сериализатора счетчиков выполнения привычки."""
+        model = Habit
+        fields = ['id', 'completions_count', 'current_streak', 'longest_streak', 'last_completed_on']
+
+    def get_current_streak(self, habit):
+        """Метод возвращает текущую серию, прерванную, если период после последнего выполнения пропущен."""
+        return get_current_streak(habit)
+
+
+class PrefetchedHabitField(serializers.PrimaryKeyRelatedField):
+    """ Класс поля связанной привычки, которое берет привычку из заранее загруженного словаря
+    context['related_habits'] вместо запроса к базе данных на каждое значение. """
+
+    def to_internal_value(self, data):
+        """Метод возвращает привычку по id из загруженного словаря."""
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.context['related_habits'][int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class HabitBulkItemSerializer(HabitSerializer):
+    """ Класс сериализатора одной привычки в массовом создании и изменении.
+
+    Связанные привычки берутся из загруженного одним запросом словаря, поэтому цепочка проверок
+    не обращается к базе данных.
+    """
+    related_habit_id = PrefetchedHabitField(
+        queryset=Habit.objects.all(),
+        source='related_habit',
+        write_only=True,
+        allow_null=True,
+        default=None
+    )
+
+
+class HabitValuesSerializer:
+    """ Класс быстрого сериализатора привычек только для чтения.
+
+    Поля DRF-сериализатора заранее компилируются в список (имя, столбец .values(), преобразование): строки
+    берутся одним запросом .values() со связанной привычкой через JOIN, а словари собираются без создания полей
+    и сериализаторов на каждую строку. Вывод совпадает с выводом исходного сериализатора.
+    """
+
+    identity_fields = (serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+                       serializers.PrimaryKeyRelatedField)
+
+    def __init__(self, serializer_class=HabitSerializer, fields=None, expand=frozenset()):
+        self.columns = ['id']
+        self.accessors = self.compile(serializer_class(), fields=fields, expand=expand)
+
+    def compile(self, serializer, prefix='', fields=None, expand=frozenset()):
+        """Метод компилирует поля сериализатора в список методов доступа к столбцам строки.
+
+        Если передан набор полей fields, компилируются только они, а вложенные сериализаторы, не указанные
+        в expand, заменяются id связанного объекта без JOIN.
+        """
+
+        accessors = []
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            column = f'{prefix}{field.source}'
+            if isinstance(field, serializers.BaseSerializer):
+                if fields is not None and name not in expand:
+                    accessors.append((name, column, None))
+                    self.columns.append(column)
+                    continue
+                accessors.append((name, f'{column}__id', self.compile(field, prefix=f'{column}__')))
+                self.columns.append(f'{column}__id')
+                continue
+            if isinstance(field, self.identity_fields):
+                convert = None
+            else:
+                convert = lru_cache(maxsize=2048)(field.to_representation)
+            accessors.append((name, column, convert))
+            self.columns.append(column)
+        return accessors
+
+    def values(self, queryset):
+        """Метод возвращает запрос строк со всеми нужными сериализатору столбцами."""
+
+        return queryset.values(*dict.fromkeys(self.columns))
+
+    def build(self, row, accessors):
+        """Метод собирает словарь одной привычки из строки."""
+
+        data = {}
+        for name, column, convert in accessors:
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif convert is None:
+                data[name] = value
+            elif isinstance(convert, list):
+                data[name] = self.build(row, convert)
+            else:
+                data[name] = convert(value)
+        return data
+
+    def to_representation(self, rows):
+        """Метод сериализует строки .values()."""
+
+        accessors = self.accessors
+        return [self.build(row, accessors) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_field_names(serializer_class=HabitSerializer):
+    """ Возвращает выводимые поля сериализатора и поля с вложенными сериализаторами, которые можно раскрыть """
+    serializer_fields = serializer_class().fields
+    readable = tuple(name for name, field in serializer_fields.items() if not field.write_only)
+    expandable = frozenset(name for name, field in serializer_fields.items()
+                           if isinstance(field, serializers.BaseSerializer))
+    return readable, expandable
+
+
+def parse_sparse_fields(params, serializer_class=HabitSerializer):
+    """ Разбирает параметры ?fields= и ?expand=.
+
+    Возвращает набор запрошенных полей (None - все поля) и набор раскрываемых вложенных полей.
+    """
+    readable, expandable = get_field_names(serializer_class)
+    fields = None
+    if params.get('fields'):
+        fields = frozenset(name.strip() for name in params['fields'].split(',') if name.strip())
+        unknown = fields - set(readable)
+        if unknown:
+            raise serializers.ValidationError({'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}.'})
+    expand = frozenset(name.strip() for name in params.get('expand', '').split(',') if name.strip())
+    if expand - expandable:
+        raise serializers.ValidationError(
+            {'expand': f'Раскрыть можно только поля: {", ".join(sorted(expandable))}.'}
+        )
+    return fields, expand
+
+
+@lru_cache(maxsize=128)
+def get_values_serializer(fields=None, expand=frozenset()):
+    """ Возвращает скомпилированный быстрый сериализатор для набора полей """
+    return HabitValuesSerializer(fields=fields, expand=expand)
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from habit_tracker.cache import bump_public_version, bump_user_version
+from habit_tracker.models import Habit
+from habit_tracker.search import restore_search
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_public_feed_on_save(sender, instance, created, **kwargs):
+    """ Сбрасывает кеш ленты, если сохранена опубликованная привычка или с привычки снята публикация,
+    и меняет версии привычек владельцев.
+    """
+    was_public = getattr(instance, '_saved_is_public', not created)
+    if instance.is_public or was_public:
+        bump_public_version()
+    for owner_id in {instance.owner_id, getattr(instance, '_saved_owner_id', None)} - {None}:
+        bump_user_version(owner_id)
+    instance._saved_is_public = instance.is_public
+    instance._saved_owner_id = instance.owner_id
+
+
+@receiver(post_delete, sender=Habit)
+def invalidate_public_feed_on_delete(sender, instance, **kwargs):
+    """ Сбрасывает кеш ленты при удалении опубликованной привычки и меняет версию привычек владельца """
+    if instance.is_public:
+        bump_public_version()
+    if instance.owner_id is not None:
+        bump_user_version(instance.owner_id)
+
+
+def restore_search_after_migrate(sender, using, **kwargs):
+    """ Восстанавливает поисковый индекс привычек после миграций, пересоздавших таблицу привычек """
+    restore_search(using)
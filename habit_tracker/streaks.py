@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from habit_tracker.models import Habit, HabitCompletion
+
+
+def continues_streak(previous, date, periodicity):
+    """ Функция проверяет, продолжает ли выполнение в date серию, последнее выполнение которой было в previous.
+
+    Серия не прерывается, если между выполнениями прошло не больше периода привычки.
+    """
+    return previous is not None and date - previous <= timedelta(days=max(periodicity or 1, 1))
+
+
+def compute_streaks(dates, periodicity):
+    """ Функция пересчитывает счетчики выполнений по упорядоченным датам выполнения за один проход """
+    count = current = longest = 0
+    previous = None
+    for date in dates:
+        current = current + 1 if continues_streak(previous, date, periodicity) else 1
+        longest = max(longest, current)
+        count += 1
+        previous = date
+    return {'completions_count': count, 'current_streak': current, 'longest_streak': longest,
+            'last_completed_on': previous}
+
+
+def get_current_streak(habit, today=None):
+    """ Функция возвращает текущую серию с учетом того, что пропущенный период прерывает ее без записи в базу """
+    today = today or timezone.localdate()
+    if habit.last_completed_on is None or not continues_streak(habit.last_completed_on, today, habit.periodicity):
+        return 0
+    return habit.current_streak
+
+
+def record_completion(habit_id, date):
+    """ Функция отмечает выполнение привычки за день и обновляет ее счетчики.
+
+    Отметка за день позже последнего выполнения обновляет счетчики за O(1). Отметка задним числом
+    пересчитывает их по журналу этой привычки. Возвращает привычку с новыми счетчиками и признак создания отметки.
+    """
+    with transaction.atomic():
+        habit = Habit.objects.select_for_update().only('periodicity', *Habit.COUNTER_FIELDS).get(pk=habit_id)
+        completion, created = HabitCompletion.objects.get_or_create(habit_id=habit_id, date=date)
+        if not created:
+            return habit, False
+        if habit.last_completed_on is None or date > habit.last_completed_on:
+            current = habit.current_streak + 1 if continues_streak(habit.last_completed_on, date,
+                                                                   habit.periodicity) else 1
+            counters = {'completions_count': habit.completions_count + 1, 'current_streak': current,
+                        'longest_streak': max(habit.longest_streak, current), 'last_completed_on': date}
+        else:
+            dates = HabitCompletion.objects.filter(habit_id=habit_id).order_by('date').values_list('date', flat=True)
+            counters = compute_streaks(dates, habit.periodicity)
+        Habit.objects.filter(pk=habit_id).update(**counters)
+        for field, value in counters.items():
+            setattr(habit, field, value)
+    return habit, True
@@ -1,9 +1,35 @@
-from datetime import time, timedelta
+import csv
+import json
+import re
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import QueryDict
+from django.utils.http import urlencode
+from django.db import connection
+from django.db.models import F, Q
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APITransactionTestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
-from habit_tracker.models import Habit
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from Coursework_6_DRF import renderers
+from Coursework_6_DRF.renderers import FastJSONParser, FastJSONRenderer
+from habit_tracker.cache import PUBLIC_VERSION_KEY, get_public_cache_stats, get_version
+from habit_tracker.filters import get_habit_filter
+from habit_tracker.models import Habit, HabitCompletion
+from habit_tracker.serializers import HabitSerializer, HabitValuesSerializer
+from habit_tracker import occurrences
+from habit_tracker.streaks import get_current_streak
+from habit_tracker.scheduling import advance_fire_at, get_next_fire_at
 
 
 User = get_user_model()
@@ -202,3 +228,908 @@ class HabitTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Habit.objects.filter(id=self.habit.id).exists())
+
+
+class HabitDueSlotTestCase(APITestCase):
+    """Тесты синхронизации слота напоминания привычки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='slot@test.com')
+
+    def test_due_slot_on_save(self):
+        """Тест расчета слота при создании и изменении привычки."""
+        habit = Habit.objects.create(owner=self.user, date_completion='04:20:00')
+        self.assertEqual(habit.due_slot, 4 * 60 + 20)
+
+        habit.date_completion = time(23, 59)
+        habit.save(update_fields=['date_completion'])
+        habit.refresh_from_db()
+        self.assertEqual(habit.due_slot, 23 * 60 + 59)
+
+    def test_due_slot_on_bulk_operations(self):
+        """Тест расчета слота при массовом создании и изменении привычек."""
+        habits = Habit.objects.bulk_create([
+            Habit(owner=self.user, date_completion=time(7, 0)),
+            Habit(owner=self.user, date_completion=None),
+        ])
+        self.assertEqual([habit.due_slot for habit in habits], [420, None])
+
+        habits[1].date_completion = time(8, 15)
+        Habit.objects.bulk_update(habits, ['date_completion'])
+        self.assertEqual(Habit.objects.get(pk=habits[1].pk).due_slot, 495)
+
+        Habit.objects.filter(owner=self.user).update(date_completion=time(0, 1))
+        self.assertEqual(set(Habit.objects.values_list('due_slot', flat=True)), {1})
+
+
+class HabitScheduleTestCase(APITestCase):
+    """Тесты расчета расписания напоминаний с учетом периодичности."""
+
+    def test_get_next_fire_at(self):
+        """Тест расчета ближайшего напоминания по времени выполнения."""
+        now = timezone.make_aware(datetime(2025, 5, 12, 7, 30))
+        self.assertEqual(get_next_fire_at(time(8, 0), now), timezone.make_aware(datetime(2025, 5, 12, 8, 0)))
+        self.assertEqual(get_next_fire_at('07:30:00', now), timezone.make_aware(datetime(2025, 5, 13, 7, 30)))
+        self.assertIsNone(get_next_fire_at(None, now))
+
+    def test_advance_fire_at(self):
+        """Тест переноса напоминания на следующий период, в том числе после простоя."""
+        fire_at = timezone.make_aware(datetime(2025, 5, 12, 7, 30))
+        self.assertEqual(advance_fire_at(fire_at, 3, fire_at), fire_at + timedelta(days=3))
+        self.assertEqual(advance_fire_at(fire_at, 3, fire_at + timedelta(days=4)), fire_at + timedelta(days=6))
+        self.assertEqual(advance_fire_at(fire_at, 1, fire_at + timedelta(days=1)), fire_at + timedelta(days=2))
+
+    def test_next_fire_at_kept_in_sync(self):
+        """Тест пересчета ближайшего напоминания только при изменении времени выполнения или периодичности."""
+        habit = Habit.objects.create(date_completion=time(7, 30))
+        self.assertIsNotNone(habit.next_fire_at)
+        fire_at = timezone.now() + timedelta(days=5)
+        Habit.objects.filter(pk=habit.pk).update(next_fire_at=fire_at)
+
+        habit = Habit.objects.get(pk=habit.pk)
+        habit.name = 'Другое название'
+        habit.save()
+        self.assertEqual(habit.next_fire_at, fire_at)
+
+        habit.periodicity = 5
+        habit.save(update_fields=['periodicity'])
+        habit.refresh_from_db()
+        self.assertLess(habit.next_fire_at, timezone.now() + timedelta(days=1))
+
+        habit.date_completion = time(9, 0)
+        habit.save()
+        self.assertEqual(timezone.localtime(habit.next_fire_at).time(), time(9, 0))
+        self.assertLess(habit.next_fire_at, timezone.now() + timedelta(days=1))
+
+    def test_next_fire_at_on_queryset_update(self):
+        """Тест пересчета ближайшего напоминания при изменении запросом периодичности и времени выражением."""
+        habit = Habit.objects.create(date_completion=time(7, 30), periodicity=1)
+        fire_at = timezone.now() + timedelta(days=5)
+        Habit.objects.filter(pk=habit.pk).update(next_fire_at=fire_at)
+
+        self.assertEqual(Habit.objects.filter(periodicity=1).update(periodicity=7), 1)
+        habit.refresh_from_db()
+        self.assertLess(habit.next_fire_at, timezone.now() + timedelta(days=1))
+
+        Habit.objects.filter(pk=habit.pk).update(date_completion=F('date_completion'))
+        habit.refresh_from_db()
+        self.assertIsNotNone(habit.next_fire_at)
+        self.assertEqual(timezone.localtime(habit.next_fire_at).time(), time(7, 30))
+
+
+class HabitCursorPaginationTestCase(APITestCase):
+    """Тесты пагинации списка привычек по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='cursor@test.com')
+        Habit.objects.bulk_create([Habit(owner=cls.user, name=f'Habit {number}') for number in range(12)])
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+
+    def test_cursor_pages(self):
+        """Тест прохода по всем страницам по курсору без подсчета COUNT(*)."""
+        url = f"{reverse('habit_tracker:habits')}?pagination=cursor"
+        ids = []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                data = self.client.get(url).json()
+                self.assertNotIn('count', data)
+                ids.extend(habit['id'] for habit in data['results'])
+                url = data['next']
+        self.assertEqual(ids, sorted(Habit.objects.values_list('id', flat=True)))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_invalid_cursor(self):
+        """Тест отказа в поддельном курсоре."""
+        response = self.client.get(reverse('habit_tracker:habits'), {'cursor': 'cD0xMDA='})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HabitFeedTestCase(APITestCase):
+    """Тесты выборки ленты привычек объединением индексных потоков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='feed@test.com')
+        cls.other = User.objects.create(email='other@test.com')
+        Habit.objects.bulk_create(
+            [Habit(owner=cls.user if number % 500 == 0 else cls.other, is_public=number % 400 == 0,
+                   name=f'Habit {number}', place=f'Place {number % 50}', periodicity=number % 7 + 1,
+                   date_completion=time(number % 24, number % 60), is_pleasant=number % 3 == 0)
+             for number in range(20000)],
+            batch_size=1000
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, queryset):
+        """Проверяет, что в плане запроса нет полного просмотра таблицы."""
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+        else:
+            self.assertNotRegex(plan, r'(?m)\bSCAN \S+$')
+
+    def test_feed_matches_or_filter(self):
+        """Тест совпадения ленты с выборкой по условию OR."""
+        expected = Habit.objects.filter(owner=self.user) | Habit.objects.filter(is_public=True)
+        self.assertEqual(
+            list(Habit.objects.visible_to(self.user).order_by('id').values_list('id', flat=True)),
+            list(expected.order_by('id').values_list('id', flat=True))
+        )
+
+    def assertBranchesLimited(self, queryset, scans=()):
+        """Проверяет, что потоки ленты читаются по индексу в порядке id без сортировки во временном B-дереве.
+
+        Допускается только просмотр индексов scans, упорядоченных по id (его останавливает LIMIT потока).
+        """
+        plan = queryset.explain()
+        self.assertNoFullScan(queryset)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Sort Key: U0', plan)
+        else:
+            self.assertNotIn('TEMP B-TREE', plan)
+            self.assertEqual(re.findall(r'\bSCAN \S+ USING (?:COVERING )?INDEX (\S+)', plan), list(scans))
+
+    def test_feed_uses_indexes(self):
+        """Тест выборки страниц ленты по индексам с сортировкой и границей страницы в каждом потоке."""
+        feed = Habit.objects.visible_to(self.user).order_by('id')
+        self.assertBranchesLimited(feed[:6], scans=['habit_public_id_idx'])
+        self.assertBranchesLimited(feed.filter(id__gt=feed[5].id)[:6])
+        self.assertEqual(feed.count(), Habit.objects.filter(Q(owner=self.user) | Q(is_public=True)).count())
+
+    def test_filters_use_indexes(self):
+        """Тест выборки ленты по индексам для каждого поддерживаемого фильтра."""
+        for params in ({'place': 'Place 7'}, {'time_from': '07:00', 'time_to': '08:30'},
+                       {'time_from': '23:00', 'time_to': '01:00'}, {'periodicity': '3'}, {'is_pleasant': 'true'},
+                       {'is_public': 'true'}, {'place': 'Place 7', 'periodicity': '3'}):
+            with self.subTest(params=params):
+                condition = get_habit_filter(QueryDict(urlencode(params)))
+                self.assertNoFullScan(Habit.objects.visible_to(self.user, condition).order_by('id')[:6])
+                self.assertNoFullScan(Habit.objects.visible_to(AnonymousUser(), condition).order_by('id')[:6])
+
+
+class HabitPublicCacheTestCase(APITestCase):
+    """Тесты кеша ленты опубликованных привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='cache@test.com')
+        cls.public = Habit.objects.create(owner=cls.user, name='Public', is_public=True)
+        cls.private = Habit.objects.create(owner=cls.user, name='Private')
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        cache.clear()
+
+    def test_anonymous_page_cached(self):
+        """Тест выдачи повторного запроса анонимного пользователя из кеша без запросов к базе данных."""
+        url = reverse('habit_tracker:habits')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(get_public_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_version_bumped_only_by_public_changes(self):
+        """Тест смены версии кеша только при изменении опубликованных данных."""
+        version = get_version(PUBLIC_VERSION_KEY)
+        self.private.name = 'Private renamed'
+        self.private.save()
+        self.assertEqual(get_version(PUBLIC_VERSION_KEY), version)
+
+        self.private.is_public = True
+        self.private.save()
+        self.assertNotEqual(get_version(PUBLIC_VERSION_KEY), version)
+
+        version = get_version(PUBLIC_VERSION_KEY)
+        public = Habit.objects.get(pk=self.public.pk)
+        public.is_public = False
+        public.save()
+        self.assertNotEqual(get_version(PUBLIC_VERSION_KEY), version)
+
+        version = get_version(PUBLIC_VERSION_KEY)
+        self.private.delete()
+        self.assertNotEqual(get_version(PUBLIC_VERSION_KEY), version)
+
+    def test_cached_page_refreshed_after_change(self):
+        """Тест обновления страницы ленты после изменения опубликованной привычки."""
+        url = reverse('habit_tracker:habits')
+        self.client.get(url)
+        self.public.name = 'Renamed'
+        self.public.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['name'], 'Renamed')
+
+
+class HabitConditionalGetTestCase(APITestCase):
+    """Тесты условного GET для списка и просмотра привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='etag@test.com')
+        cls.habit = Habit.objects.create(owner=cls.user, name='Habit')
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_not_modified(self):
+        """Тест ответа 304 для неизменного списка без запросов к базе данных."""
+        url = reverse('habit_tracker:habits')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Habit.objects.create(owner=self.user, name='Another habit')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_not_modified(self):
+        """Тест ответа 304 для неизменной привычки за один запрос к базе данных."""
+        url = reverse('habit_tracker:habit', args=(self.habit.pk,))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.habit.name = 'Renamed'
+        self.habit.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['name'], 'Renamed')
+
+    def test_detail_etag_not_shared_with_other_user(self):
+        """Тест недоступности чужой привычки даже с верным ETag."""
+        url = reverse('habit_tracker:habit', args=(self.habit.pk,))
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(user=User.objects.create(email='stranger@test.com'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HabitQueryBudgetTestCase(APITestCase):
+    """Тесты количества запросов к базе данных при выдаче привычек со связанными привычками."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='budget@test.com')
+        pleasant = Habit.objects.bulk_create([Habit(owner=cls.user, is_pleasant=True) for number in range(10)])
+        Habit.objects.bulk_create([Habit(owner=cls.user, related_habit=habit) for habit in pleasant])
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        """Тест постоянного количества запросов на страницу списка при любом размере страницы."""
+        url = reverse('habit_tracker:habits')
+        counts = []
+        for page_size in (2, 10):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'page': 2, 'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 2)
+
+    def test_detail_queries(self):
+        """Тест загрузки привычки вместе со связанной привычкой и владельцем."""
+        habit = Habit.objects.filter(related_habit__isnull=False).first()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('habit_tracker:habit', args=(habit.pk,)))
+        self.assertEqual(response.json()['related_habit']['id'], habit.related_habit_id)
+
+
+class HabitValuesSerializerTestCase(APITestCase):
+    """Тесты быстрого сериализатора привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='values@test.com')
+        pleasant = Habit.objects.create(owner=cls.user, name='Pleasant', is_pleasant=True, date_completion=time(7, 5),
+                                        execution_time=timedelta(seconds=75))
+        chained = Habit.objects.create(owner=cls.user, name='Chained', related_habit=pleasant, is_public=True,
+                                       execution_time=timedelta(0))
+        Habit.objects.create(owner=cls.user, name='Related to chained', related_habit=chained, award=None,
+                             date_completion=time(23, 59, 30), execution_time=timedelta(hours=1, seconds=1))
+        Habit.objects.create(name='Без владельца', place='Дом', action='Читать', award='Чай')
+
+    def test_output_is_byte_identical(self):
+        """Тест побайтного совпадения вывода с HabitSerializer."""
+        queryset = Habit.objects.select_related('related_habit').order_by('id')
+        values_serializer = HabitValuesSerializer()
+        self.assertEqual(
+            JSONRenderer().render(values_serializer.to_representation(values_serializer.values(queryset))),
+            JSONRenderer().render(HabitSerializer(queryset, many=True).data)
+        )
+
+
+class FastJSONTestCase(APITestCase):
+    """Тесты быстрого рендерера и парсера JSON."""
+
+    data = {
+        'name': 'Привычка \u2028', 'date_completion': time(7, 5, 30), 'execution_time': timedelta(seconds=90),
+        'award': Decimal('1.50'), 'created': timezone.make_aware(datetime(2024, 1, 2, 3, 4, 5, 678901)),
+        1: [None, True, 1.5],
+    }
+
+    def test_render_matches_json_renderer(self):
+        """Тест совпадения вывода со стандартным JSONRenderer."""
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(self.data, 'application/json; indent=4'),
+                         JSONRenderer().render(self.data, 'application/json; indent=4'))
+
+    @skipIf(renderers.orjson is None, 'orjson не установлен')
+    def test_orjson_used(self):
+        """Тест рендеринга и разбора через orjson, если он установлен."""
+        body = '{"name": "Привычка", "periodicity": 3, "award": null}'.encode()
+        with mock.patch.object(renderers.orjson, 'dumps', wraps=renderers.orjson.dumps) as dumps, \
+                mock.patch.object(renderers.orjson, 'loads', wraps=renderers.orjson.loads) as loads:
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+            self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        dumps.assert_called_once()
+        loads.assert_called_once()
+
+    def test_fallback_without_orjson(self):
+        """Тест работы на стандартном json, если orjson не установлен."""
+        body = b'{"name": "\xd0\x9f\xd1\x80\xd0\xb8\xd0\xb2\xd1\x8b\xd1\x87\xd0\xba\xd0\xb0", "is_public": true}'
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+            self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), {'name': 'Привычка', 'is_public': True})
+
+    def test_parse_error(self):
+        """Тест ошибки разбора некорректного JSON."""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"name": '))
+
+
+class HabitsExportTestCase(APITestCase):
+    """Тесты потоковой выгрузки привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='export@test.com')
+        cls.other = User.objects.create(email='export-other@test.com')
+        pleasant = Habit.objects.create(owner=cls.user, name='Pleasant', is_pleasant=True, date_completion=time(8))
+        Habit.objects.create(owner=cls.user, name='Own', related_habit=pleasant, execution_time=timedelta(seconds=60))
+        Habit.objects.create(owner=cls.other, name='Public', is_public=True)
+        Habit.objects.create(owner=cls.other, name='Private')
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        """Возвращает ответ выгрузки и ее содержимое."""
+        response = self.client.get(reverse('habit_tracker:habits_export'), params)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        """Тест выгрузки собственных привычек в NDJSON в том же виде, что и в списке привычек."""
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        habits = Habit.objects.filter(owner=self.user).select_related('related_habit').order_by('id')
+        self.assertEqual([json.loads(line) for line in content.splitlines()],
+                         json.loads(JSONRenderer().render(HabitSerializer(habits, many=True).data)))
+
+    def test_csv_export_with_public(self):
+        """Тест выгрузки в CSV вместе с опубликованными привычками других пользователей."""
+        response, content = self.export(export_format='csv', include_public='1')
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual([row['name'] for row in rows], ['Pleasant', 'Own', 'Public'])
+        self.assertEqual(rows[1]['related_habit'], rows[0]['id'])
+        self.assertEqual(rows[1]['execution_time'], '00:01:00')
+
+    def test_export_errors(self):
+        """Тест отказа в неизвестном формате и выгрузке без авторизации."""
+        response = self.client.get(reverse('habit_tracker:habits_export'), {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('habit_tracker:habits_export'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class HabitsBulkTestCase(APITestCase):
+    """Тесты массового создания и изменения привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='bulk@test.com')
+        cls.other = User.objects.create(email='bulk-other@test.com')
+        cls.pleasant = Habit.objects.create(owner=cls.user, name='Pleasant', is_pleasant=True)
+        cls.useful = Habit.objects.create(owner=cls.user, name='Useful', award='Award')
+        cls.foreign = Habit.objects.create(owner=cls.other, name='Foreign', is_pleasant=True)
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('habit_tracker:habits_bulk')
+
+    def test_bulk_create_queries(self):
+        """Тест создания 200 привычек за постоянное небольшое количество запросов."""
+        items = [{'name': f'Habit {number}', 'date_completion': '07:30:00', 'execution_time': '00:01:00',
+                  'periodicity': 1, 'related_habit_id': self.pleasant.pk} for number in range(200)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(Habit.objects.filter(owner=self.user, related_habit=self.pleasant).count(), 200)
+        self.assertEqual(response.json()[0]['related_habit']['id'], self.pleasant.pk)
+        self.assertIsNotNone(Habit.objects.get(pk=response.json()[0]['id']).next_fire_at)
+
+    def test_bulk_update(self):
+        """Тест изменения привычек пользователя по id."""
+        version = get_version(PUBLIC_VERSION_KEY)
+        response = self.client.post(self.url, [
+            {'id': self.useful.pk, 'name': 'Useful renamed', 'related_habit_id': self.pleasant.pk,
+             'execution_time': '00:02:00', 'is_public': False},
+            {'name': 'New', 'execution_time': '00:00:30', 'is_public': True},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.useful.refresh_from_db()
+        self.assertEqual(self.useful.name, 'Useful renamed')
+        self.assertEqual(self.useful.related_habit, self.pleasant)
+        self.assertNotEqual(get_version(PUBLIC_VERSION_KEY), version)
+
+    def test_bulk_errors_per_item(self):
+        """Тест ошибок по каждому элементу без сохранения всего списка."""
+        response = self.client.post(self.url, [
+            {'name': 'Valid', 'execution_time': '00:01:00'},
+            {'name': 'Pleasant with award', 'is_pleasant': True, 'award': 'Award', 'execution_time': '00:01:00'},
+            {'name': 'Not pleasant related', 'related_habit_id': self.useful.pk, 'execution_time': '00:01:00'},
+            {'name': 'Foreign related', 'related_habit_id': self.foreign.pk, 'execution_time': '00:01:00'},
+            {'name': 'Missing related', 'related_habit_id': 10 ** 6, 'execution_time': '00:01:00'},
+            {'id': self.foreign.pk, 'name': 'Foreign update', 'execution_time': '00:01:00'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('non_field_errors', errors[1])
+        self.assertIn('non_field_errors', errors[2])
+        self.assertIn('non_field_errors', errors[3])
+        self.assertIn('related_habit_id', errors[4])
+        self.assertIn('id', errors[5])
+        self.assertFalse(Habit.objects.filter(name='Valid').exists())
+
+
+class HabitWriteQueriesTestCase(APITestCase):
+    """Тесты количества запросов при создании, изменении и удалении привычки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='writes@test.com')
+        cls.other = User.objects.create(email='writes-other@test.com')
+        cls.pleasant = Habit.objects.create(owner=cls.user, name='Pleasant', is_pleasant=True)
+        cls.habit = Habit.objects.create(owner=cls.user, name='Habit', award='Award')
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_writes_once(self):
+        """Тест создания привычки одним INSERT с владельцем - текущим пользователем."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('habit_tracker:adding_habit'), {
+                'name': 'New', 'execution_time': '00:01:00', 'related_habit_id': self.pleasant.pk,
+                'owner': self.other.pk
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([query['sql'].split()[0] for query in queries.captured_queries], ['SELECT', 'INSERT'])
+        self.assertEqual(Habit.objects.get(pk=response.json()['id']).owner, self.user)
+
+    def test_update_queries(self):
+        """Тест изменения привычки: выборка по владельцу и UPDATE."""
+        with self.assertNumQueries(2):
+            response = self.client.patch(reverse('habit_tracker:update_habit', args=(self.habit.pk,)),
+                                         {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_foreign_habit_not_found(self):
+        """Тест недоступности чужой привычки для изменения и удаления."""
+        self.client.force_authenticate(user=self.other)
+        response = self.client.patch(reverse('habit_tracker:update_habit', args=(self.habit.pk,)),
+                                     {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        with self.assertNumQueries(1):
+            response = self.client.delete(reverse('habit_tracker:delete_habit', args=(self.habit.pk,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class HabitsSearchTestCase(APITestCase):
+    """Тесты поиска опубликованных привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='search@test.com')
+        cls.name_match = Habit.objects.create(owner=cls.user, name='Пробежка', action='Бегать', place='Парк',
+                                              is_public=True)
+        cls.place_match = Habit.objects.create(owner=cls.user, name='Чтение', action='Читать',
+                                               place='Беговая дорожка', is_public=True)
+        Habit.objects.bulk_create([Habit(owner=cls.user, name=f'Пробежка {number}', is_public=True)
+                                   for number in range(6)])
+        Habit.objects.bulk_create([Habit(owner=cls.user, name='Медитация', is_public=True) for number in range(20)])
+        cls.private = Habit.objects.create(owner=cls.user, name='Пробежка тайная')
+
+    def search(self, **params):
+        """Возвращает ответ поиска."""
+        return self.client.get(reverse('habit_tracker:habits_search'), params)
+
+    def test_ranked_cursor_pages(self):
+        """Тест ранжированного поиска по курсору без повторов и без неопубликованных привычек."""
+        ids = []
+        url, params = reverse('habit_tracker:habits_search'), {'q': 'пробежка', 'page_size': 3}
+        while url:
+            data = self.client.get(url, params).json()
+            ids.extend(habit['id'] for habit in data['results'])
+            url, params = data['next'], None
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        self.assertNotIn(self.private.pk, ids)
+
+    def test_name_outranks_place(self):
+        """Тест ранжирования: совпадение в названии выше совпадения в месте."""
+        in_place = Habit.objects.create(owner=self.user, name='Растяжка', place='Йога', is_public=True)
+        in_name = Habit.objects.create(owner=self.user, name='Йога', place='Зал', is_public=True)
+        ids = [habit['id'] for habit in self.search(q='йога').json()['results']]
+        self.assertEqual(ids, [in_name.pk, in_place.pk])
+
+    def test_prefix_match_on_place(self):
+        """Тест поиска по началу слова в месте выполнения."""
+        ids = [habit['id'] for habit in self.search(q='бегов').json()['results']]
+        self.assertEqual(ids, [self.place_match.pk])
+
+    def test_index_follows_writes(self):
+        """Тест обновления поискового индекса при изменении и удалении привычки."""
+        self.place_match.place = 'Библиотека'
+        self.place_match.save()
+        self.assertEqual(self.search(q='бегов').json()['results'], [])
+        self.assertEqual(self.search(q='библиотека').json()['results'][0]['id'], self.place_match.pk)
+        self.place_match.delete()
+        self.assertEqual(self.search(q='библиотека').json()['results'], [])
+
+    def test_invalid_requests(self):
+        """Тест отказа без текста поиска и с поддельным курсором."""
+        self.assertEqual(self.search(q=' ').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search(q='чтение', cursor='WzEsIDFd').status_code, status.HTTP_404_NOT_FOUND)
+
+
+@skipIf(connection.vendor != 'sqlite', 'таблицу пересоздает только SQLite')
+class HabitsSearchRebuildTestCase(APITransactionTestCase):
+    """Тесты восстановления поискового индекса после пересоздания таблицы привычек."""
+
+    def rebuild_table(self, max_length):
+        """Пересоздает таблицу привычек изменением длины названия, как это делает миграция в SQLite."""
+        field = Habit._meta.get_field('name')
+        altered = field.clone()
+        altered.set_attributes_from_name('name')
+        altered.model, altered.max_length = Habit, max_length
+        with connection.schema_editor() as schema_editor:
+            schema_editor.alter_field(Habit, field, altered)
+
+    def search(self, text):
+        """Возвращает id найденных привычек."""
+        response = self.client.get(reverse('habit_tracker:habits_search'), {'q': text})
+        return [habit['id'] for habit in response.json()['results']]
+
+    def test_index_follows_writes_after_rebuild(self):
+        """Тест поиска новых и измененных привычек после пересоздания таблицы и миграции."""
+        user = User.objects.create(email='rebuild@test.com')
+        existing = Habit.objects.create(owner=user, name='Пробежка', is_public=True)
+        self.rebuild_table(201)
+        self.addCleanup(call_command, 'migrate', verbosity=0)
+        self.addCleanup(self.rebuild_table, 200)
+        call_command('migrate', verbosity=0)
+        created = Habit.objects.create(owner=user, name='Медитация', is_public=True)
+        existing.name = 'Йога'
+        existing.save()
+        self.assertEqual(self.search('медитация'), [created.pk])
+        self.assertEqual(self.search('йога'), [existing.pk])
+        self.assertEqual(self.search('пробежка'), [])
+
+
+class HabitFilterTestCase(APITestCase):
+    """Тесты фильтрации и сортировки списка привычек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='filter@test.com')
+        cls.morning = Habit.objects.create(owner=cls.user, name='Б зарядка', place='Дом', periodicity=1,
+                                           date_completion=time(7, 30))
+        cls.night = Habit.objects.create(owner=cls.user, name='В сон', place='Дом', periodicity=1,
+                                         date_completion=time(23, 30), is_pleasant=True)
+        cls.walk = Habit.objects.create(owner=cls.user, name='А прогулка', place='Парк', periodicity=2,
+                                        date_completion=time(12), is_public=True)
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+
+    def ids(self, **params):
+        """Возвращает id привычек списка с параметрами запроса."""
+        response = self.client.get(reverse('habit_tracker:habits'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [habit['id'] for habit in response.json()['results']]
+
+    def test_filters(self):
+        """Тест отбора по каждому фильтру."""
+        self.assertEqual(self.ids(place='Дом'), [self.morning.pk, self.night.pk])
+        self.assertEqual(self.ids(is_pleasant='true'), [self.night.pk])
+        self.assertEqual(self.ids(is_public='1'), [self.walk.pk])
+        self.assertEqual(self.ids(periodicity=2), [self.walk.pk])
+        self.assertEqual(self.ids(time_from='07:00', time_to='12:00'), [self.morning.pk, self.walk.pk])
+        self.assertEqual(self.ids(time_from='23:00', time_to='08:00'), [self.morning.pk, self.night.pk])
+        self.assertEqual(self.ids(place='Дом', periodicity=1, is_pleasant='false'), [self.morning.pk])
+
+    def test_ordering(self):
+        """Тест сортировки по разрешенным полям и игнорирования остальных."""
+        self.assertEqual(self.ids(ordering='name'), [self.walk.pk, self.morning.pk, self.night.pk])
+        self.assertEqual(self.ids(ordering='-date_completion'), [self.night.pk, self.walk.pk, self.morning.pk])
+        self.assertEqual(self.ids(ordering='owner__email'), [self.morning.pk, self.night.pk, self.walk.pk])
+
+    def test_invalid_filters(self):
+        """Тест отказа в некорректных значениях фильтров."""
+        for params in ({'is_public': 'yes please'}, {'periodicity': 'weekly'}, {'time_from': '7 утра'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('habit_tracker:habits'), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HabitSparseFieldsTestCase(APITestCase):
+    """Тесты выборочных полей ?fields= и ?expand=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """ Метод класса с начальными данными для тестов."""
+        cls.user = User.objects.create(email='sparse@test.com')
+        cls.pleasant = Habit.objects.create(owner=cls.user, name='Pleasant', is_pleasant=True)
+        cls.habit = Habit.objects.create(owner=cls.user, name='Habit', related_habit=cls.pleasant,
+                                         date_completion=time(9, 15))
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, url, **params):
+        """Возвращает ответ и SQL выполненных запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_list_fields(self):
+        """Тест сокращения вывода и столбцов запроса списка без присоединения связанной привычки."""
+        data, sql = self.get(reverse('habit_tracker:habits'), fields='name,date_completion,related_habit')
+        self.assertEqual(data['results'][1], {'name': 'Habit', 'date_completion': '09:15:00',
+                                              'related_habit': self.pleasant.pk})
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"place"', sql)
+
+    def test_list_expand(self):
+        """Тест раскрытия связанной привычки в сокращенном выводе."""
+        data, sql = self.get(reverse('habit_tracker:habits'), fields='id,related_habit', expand='related_habit')
+        self.assertEqual(data['results'][1]['related_habit']['name'], 'Pleasant')
+        self.assertIn('JOIN', sql)
+
+    def test_detail_fields(self):
+        """Тест сокращения вывода и столбцов запроса привычки."""
+        url = reverse('habit_tracker:habit', args=(self.habit.pk,))
+        data, sql = self.get(url, fields='id,name,related_habit')
+        self.assertEqual(data, {'id': self.habit.pk, 'name': 'Habit', 'related_habit': self.pleasant.pk})
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"place"', sql)
+        data, sql = self.get(url, fields='related_habit', expand='related_habit')
+        self.assertEqual(data['related_habit']['id'], self.pleasant.pk)
+        self.assertEqual(self.get(url)[0]['related_habit']['name'], 'Pleasant')
+
+    def test_unknown_fields(self):
+        """Тест отказа в неизвестных полях."""
+        for params in ({'fields': 'id,password'}, {'fields': 'id', 'expand': 'owner'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('habit_tracker:habits'), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HabitCompletionTestCase(APITestCase):
+    """Тесты отметок о выполнении привычки и серий выполнения."""
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        self.user = User.objects.create(email='streak@test.com')
+        self.habit = Habit.objects.create(owner=self.user, name='Streak', periodicity=1)
+        self.url = reverse('habit_tracker:complete_habit', args=(self.habit.pk,))
+        self.today = timezone.localdate()
+        self.client.force_authenticate(user=self.user)
+
+    def complete(self, days_ago, expected=status.HTTP_201_CREATED):
+        """Отмечает выполнение привычки за день days_ago дней назад и возвращает счетчики."""
+        response = self.client.post(self.url, {'date': str(self.today - timedelta(days=days_ago))})
+        self.assertEqual(response.status_code, expected)
+        return response.json()
+
+    def test_append_and_break(self):
+        """Тест обновления счетчиков при отметке за новый день и прерывания серии пропуском."""
+        self.complete(5)
+        self.complete(4)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.complete(3)
+        self.assertEqual((data['completions_count'], data['current_streak'], data['longest_streak']), (3, 0, 3))
+        self.assertFalse(any('ORDER BY' in query['sql'] for query in queries.captured_queries))
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.current_streak, 3)
+        data = self.complete(0)
+        self.assertEqual((data['completions_count'], data['current_streak'], data['longest_streak']), (4, 1, 3))
+
+    def test_backfill_and_duplicate(self):
+        """Тест пересчета при отметке задним числом и повторной отметки за тот же день."""
+        self.complete(0)
+        self.complete(2)
+        data = self.complete(1)
+        self.assertEqual((data['completions_count'], data['current_streak'], data['longest_streak']), (3, 3, 3))
+        self.assertEqual(self.complete(1, expected=status.HTTP_200_OK)['completions_count'], 3)
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), 3)
+
+    def test_default_date_and_future(self):
+        """Тест отметки за сегодня по умолчанию и отказа в отметке за будущий день."""
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['last_completed_on'], str(self.today))
+        self.complete(-1, expected=status.HTTP_400_BAD_REQUEST)
+
+    def test_foreign_habit(self):
+        """Тест отказа в отметке чужой привычки."""
+        self.client.force_authenticate(user=User.objects.create(email='other@test.com'))
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_keeps_counters(self):
+        """Тест изменения привычки без перезаписи счетчиков, обновленных после ее загрузки."""
+        habit = Habit.objects.get(pk=self.habit.pk)
+        self.complete(0)
+        request = mock.Mock(user=self.user)
+        serializer = HabitSerializer(habit, data={'name': 'Renamed'}, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        habit.refresh_from_db()
+        self.assertEqual((habit.name, habit.completions_count), ('Renamed', 1))
+
+        response = self.client.patch(reverse('habit_tracker:update_habit', args=(habit.pk,)), {'place': 'Дом'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        habit.refresh_from_db()
+        self.assertEqual((habit.place, habit.completions_count), ('Дом', 1))
+
+    def test_current_streak_periodicity(self):
+        """Тест сохранения серии в пределах периода привычки."""
+        self.habit.periodicity = 3
+        self.habit.last_completed_on = self.today - timedelta(days=3)
+        self.habit.current_streak = 2
+        self.assertEqual(get_current_streak(self.habit, self.today), 2)
+        self.assertEqual(get_current_streak(self.habit, self.today + timedelta(days=1)), 0)
+
+    def test_repair_streaks(self):
+        """Тест пересчета счетчиков по журналу выполнений."""
+        for days_ago in (4, 3, 1, 0):
+            HabitCompletion.objects.create(habit=self.habit, date=self.today - timedelta(days=days_ago))
+        stale = Habit.objects.create(owner=self.user, name='Stale')
+        Habit.objects.filter(pk=stale.pk).update(completions_count=5, current_streak=5, longest_streak=5)
+        call_command('repair_streaks', batch_size=1, stdout=StringIO())
+        self.habit.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((self.habit.completions_count, self.habit.current_streak, self.habit.longest_streak,
+                          self.habit.last_completed_on), (4, 2, 2, self.today))
+        self.assertEqual((stale.completions_count, stale.longest_streak), (0, 0))
+
+
+class HabitsCalendarTestCase(APITestCase):
+    """Тесты календаря напоминаний привычек."""
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+        cache.clear()
+        self.user = User.objects.create(email='calendar@test.com')
+        self.today = timezone.localdate()
+        self.weekly = Habit.objects.create(owner=self.user, name='Weekly', date_completion=time(9), periodicity=3)
+        self.daily = Habit.objects.create(owner=self.user, name='Daily', date_completion=time(8), periodicity=1)
+        Habit.objects.create(owner=self.user, name='No time')
+        Habit.objects.create(owner=User.objects.create(email='other@test.com'), name='Foreign',
+                             date_completion=time(7), periodicity=1)
+        anchor = timezone.make_aware(datetime.combine(self.today + timedelta(days=1), time(9)))
+        Habit.objects.filter(owner=self.user, date_completion__isnull=False).update(next_fire_at=anchor)
+        self.url = reverse('habit_tracker:habits_calendar')
+        self.client.force_authenticate(user=self.user)
+
+    def get_days(self, **params):
+        """Возвращает дни календаря."""
+        response = self.client.get(self.url, {'days': 10, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['days']
+
+    def test_calendar(self):
+        """Тест раскрытия расписаний в дни напоминаний с порядком по времени выполнения."""
+        days = self.get_days()
+        self.assertEqual(len(days), 10)
+        for offset in range(10):
+            expected = [self.daily.pk, self.weekly.pk] if offset % 3 == 1 else [self.daily.pk]
+            self.assertEqual(days[str(self.today + timedelta(days=offset))], expected)
+
+    def test_python_fallback(self):
+        """Тест совпадения календаря без NumPy с векторным."""
+        habits = occurrences.get_calendar_habits(self.user)
+        expected = occurrences.build_calendar(habits, self.today, 366)
+        with mock.patch.object(occurrences, 'numpy', None):
+            self.assertEqual(occurrences.build_calendar(habits, self.today, 366), expected)
+        self.assertEqual(occurrences.build_calendar([], self.today, 10)['days'], {})
+
+    @skipIf(occurrences.numpy is None, 'NumPy не установлен')
+    def test_numpy_matches_python(self):
+        """Тест совпадения векторного раскрытия с циклом на случайных расписаниях."""
+        start = self.today.toordinal()
+        anchors = [start + offset for offset in range(-50, 50, 7)]
+        periods = [period for period in range(1, 16)][:len(anchors)]
+        days, habits = occurrences.expand_numpy(anchors, periods, start, start + 365)
+        self.assertEqual((days.tolist(), habits.tolist()),
+                         occurrences.expand_python(anchors, periods, start, start + 365))
+
+    def test_cache_invalidation(self):
+        """Тест кеширования календаря и его сброса при изменении привычки пользователя."""
+        self.get_days()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_days()
+        self.assertEqual(len(queries), 0)
+        daily = Habit.objects.get(pk=self.daily.pk)
+        daily.periodicity = 2
+        daily.save()
+        days = self.get_days()
+        self.assertNotIn(str(self.today), days)
+        self.assertEqual(days[str(self.today + timedelta(days=1))], [self.daily.pk, self.weekly.pk])
+
+    def test_invalid_params(self):
+        """Тест отказа в календаре с прошедшего дня, слишком длинном и без авторизации."""
+        for params in ({'start': str(self.today - timedelta(days=1))}, {'days': 367}, {'days': 0}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
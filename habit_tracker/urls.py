@@ -1,8 +1,13 @@
 from django.urls import path
 from habit_tracker.apps import HabitTrackerConfig
 from habit_tracker.views import (
+    HabitCompletionAPIView,
     HabitCreateAPIView,
     HabitsListAPIView,
+    HabitsExportAPIView,
+    HabitsBulkAPIView,
+    HabitsCalendarAPIView,
+    HabitsSearchAPIView,
     HabitRetrieveAPIView,
     HabitUpdateAPIView,
     HabitDestroyAPIView,
@@ -13,8 +18,13 @@ app_name = HabitTrackerConfig.name
 
 urlpatterns = [
     path("habits/", HabitsListAPIView.as_view(), name="habits"),
+    path("habits/export/", HabitsExportAPIView.as_view(), name="habits_export"),
+    path("habits/bulk/", HabitsBulkAPIView.as_view(), name="habits_bulk"),
+    path("habits/calendar/", HabitsCalendarAPIView.as_view(), name="habits_calendar"),
+    path("habits/search/", HabitsSearchAPIView.as_view(), name="habits_search"),
     path("habit/<int:pk>/", HabitRetrieveAPIView.as_view(), name="habit"),
     path("habit/new/", HabitCreateAPIView.as_view(), name="adding_habit"),
     path("habit/<int:pk>/update/", HabitUpdateAPIView.as_view(), name="update_habit"),
     path("habit/<int:pk>/delete/", HabitDestroyAPIView.as_view(), name="delete_habit"),
+    path("habit/<int:pk>/complete/", HabitCompletionAPIView.as_view(), name="complete_habit"),
 ]
@@ -78,10 +78,13 @@ class RelatedPublicValidator(BaseValidator):
 
 
 class RelatedOwnerValidator(BaseValidator):
-    """ Подтверждает, что связанная привычка принадлежит тому же владельцу, что и текущая привычка. """
+    """ Подтверждает, что связанная привычка принадлежит тому же владельцу, что и текущая привычка.
+
+    Сравниваются id владельцев, поэтому владелец связанной привычки не загружается из базы данных.
+    """
     def validate(self, related_habit, owner):
         """Метод для проверки."""
-        if related_habit is not None and related_habit.owner != owner:
+        if related_habit is not None and related_habit.owner_id != getattr(owner, 'pk', owner):
             raise serializers.ValidationError(
                 'Указанная связанная привычка должна быть создана Вами.'
             )
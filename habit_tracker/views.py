@@ -1,36 +1,355 @@
-from rest_framework import generics
-from django.db.models import Q
+import csv
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from Coursework_6_DRF.renderers import FastJSONRenderer
+from habit_tracker.cache import (bump_public_version, bump_user_version, get_calendar, get_calendar_key,
+                                 get_habit_etag, get_list_etag, get_public_page, set_calendar, set_public_page)
 from habit_tracker.models import Habit
-from habit_tracker.paginators import HabitsPaginator
-from habit_tracker.serializers import HabitSerializer
+from habit_tracker.filters import HabitOrderingFilter, get_habit_filter
+from habit_tracker.paginators import HabitsCursorPaginator, HabitsPaginator, HabitsSearchPaginator
+from habit_tracker.occurrences import build_calendar, get_calendar_habits
+from habit_tracker.serializers import (HabitBulkItemSerializer, HabitCalendarParamsSerializer,
+                                       HabitCompletionSerializer, HabitSerializer, HabitStreakSerializer, HabitValuesSerializer, get_values_serializer,
+                                       parse_sparse_fields)
+from habit_tracker.streaks import record_completion
 from users.permissions import IsOwner
 
 
+def not_modified(request, etag):
+    """Возвращает ответ 304, если ETag из заголовка If-None-Match совпадает с текущим."""
+
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in etags or '*' in etags:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return None
+
+
 class HabitsListAPIView(generics.ListAPIView):
     """Класс представления вида Generic для эндпоинта списка привычек."""
 
     serializer_class = HabitSerializer
     queryset = Habit.objects.all()
     pagination_class = HabitsPaginator
+    filter_backends = [HabitOrderingFilter]
+    ordering_fields = ['id', 'name', 'date_completion', 'periodicity']
+    ordering = ['id']
+
+    @property
+    def paginator(self):
+        """Пагинатор запроса: по курсору, если передан cursor или pagination=cursor, иначе постраничный."""
+
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = HabitsCursorPaginator()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_queryset(self):
         """Метод для изменения запроса к базе данных по объектам модели "Привычки"."""
 
-        user = self.request.user
-        if user.is_authenticated:
-            return Habit.objects.filter(Q(owner=user) | Q(is_public=True)).order_by('id')
+        condition = get_habit_filter(self.request.query_params)
+        return Habit.objects.visible_to(self.request.user, condition).select_related('related_habit')
+
+    def list(self, request, *args, **kwargs):
+        """Метод выдачи списка привычек с условным GET: анонимным пользователям страницы ленты отдаются из кеша."""
+
+        etag = get_list_etag(request)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        if request.user.is_authenticated:
+            response = self.list_page()
         else:
-            return Habit.objects.filter(is_public=True).order_by('id')
+            key, data = get_public_page(request)
+            if data is not None:
+                response = Response(data, headers={'X-Cache': 'HIT'})
+            else:
+                response = self.list_page()
+                set_public_page(key, response.data)
+                response['X-Cache'] = 'MISS'
+        response['ETag'] = etag
+        return response
+
+    def list_page(self):
+        """Метод формирует страницу списка быстрым сериализатором из строк .values().
+
+        Параметры ?fields= и ?expand= сокращают и вывод, и список столбцов запроса.
+        """
+
+        values_serializer = get_values_serializer(*parse_sparse_fields(self.request.query_params))
+        rows = values_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(values_serializer.to_representation(rows))
+        return self.get_paginated_response(values_serializer.to_representation(page))
+
+
+class Echo:
+    """Класс псевдобуфера: csv.writer записывает в него строку, а он ее возвращает для потоковой выдачи."""
+
+    def write(self, value):
+        """Метод возвращает записанное значение."""
+
+        return value
+
+
+class HabitsSearchAPIView(generics.GenericAPIView):
+    """Класс представления вида Generic для поиска опубликованных привычек по названию, действию и месту.
+
+    Результаты упорядочены по релевантности и разбиты на страницы по подписанному курсору (ранг, id).
+    """
+
+    serializer_class = HabitSerializer
+    pagination_class = HabitsSearchPaginator
+    values_serializer = HabitValuesSerializer()
+
+    def get(self, request, *args, **kwargs):
+        """Метод возвращает страницу найденных привычек."""
+
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': 'Укажите текст для поиска.'})
+        positions = self.paginator.paginate_search(text, request)
+        ids = [habit_id for rank, habit_id in positions]
+        rows = self.values_serializer.values(Habit.objects.filter(pk__in=ids))
+        habits = {habit['id']: habit for habit in self.values_serializer.to_representation(rows)}
+        return self.get_paginated_response([habits[habit_id] for habit_id in ids if habit_id in habits])
+
+
+class HabitsExportAPIView(generics.GenericAPIView):
+    """Класс представления вида Generic для потоковой выгрузки привычек пользователя в NDJSON или CSV.
+
+    По параметру include_public выгружаются также опубликованные привычки, как в списке привычек. Строки читаются
+    из базы данных порциями, поэтому память не растет с количеством привычек.
+    """
+
+    permission_classes = [IsAuthenticated]
+    values_serializer = HabitValuesSerializer()
+    export_formats = {
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+    }
+
+    def get_queryset(self):
+        """Метод для изменения запроса к базе данных по объектам модели "Привычки"."""
+
+        user = self.request.user
+        if self.request.query_params.get('include_public') in ('1', 'true'):
+            return Habit.objects.visible_to(user).order_by('id')
+        return Habit.objects.filter(owner=user).order_by('id')
+
+    def iter_habits(self):
+        """Метод выдает привычки в виде словарей, читая строки из базы данных порциями."""
+
+        rows = self.values_serializer.values(self.get_queryset()).iterator(
+            chunk_size=settings.HABIT_EXPORT_CHUNK_SIZE
+        )
+        for row in rows:
+            yield self.values_serializer.build(row, self.values_serializer.accessors)
+
+    def iter_ndjson(self):
+        """Метод выдает привычки построчно в формате NDJSON."""
+
+        renderer = FastJSONRenderer()
+        for habit in self.iter_habits():
+            yield renderer.render(habit) + b'\n'
+
+    def iter_csv(self):
+        """Метод выдает привычки построчно в формате CSV, связанная привычка выгружается своим id."""
+
+        writer = csv.writer(Echo())
+        fields = [name for name, column, convert in self.values_serializer.accessors]
+        yield writer.writerow(fields)
+        for habit in self.iter_habits():
+            if habit['related_habit'] is not None:
+                habit['related_habit'] = habit['related_habit']['id']
+            yield writer.writerow(habit.values())
+
+    def get(self, request, *args, **kwargs):
+        """Метод возвращает потоковый ответ с выгрузкой привычек."""
+
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in self.export_formats:
+            raise ValidationError({'export_format': f'Допустимые форматы: {", ".join(self.export_formats)}.'})
+        content_type, extension = self.export_formats[export_format]
+        stream = self.iter_ndjson() if export_format == 'ndjson' else self.iter_csv()
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="habits.{extension}"'
+        return response
+
+
+class HabitsCalendarAPIView(generics.GenericAPIView):
+    """Класс представления вида Generic для календаря напоминаний привычек пользователя.
 
+    Календарь кешируется по версии привычек пользователя и сбрасывается при любом их изменении.
+    """
 
-class HabitRetrieveAPIView(generics.RetrieveAPIView):
+    serializer_class = HabitCalendarParamsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """Метод возвращает дни напоминаний привычек пользователя на days дней начиная с start."""
+
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start, days = serializer.validated_data['start'], serializer.validated_data['days']
+        key = get_calendar_key(request.user.pk, start, days)
+        data = get_calendar(key)
+        if data is None:
+            data = build_calendar(get_calendar_habits(request.user), start, days)
+            set_calendar(key, data)
+        return Response(data)
+
+
+class HabitsBulkAPIView(generics.GenericAPIView):
+    """Класс представления вида Generic для массового создания и изменения привычек пользователя.
+
+    Принимает список привычек: элементы с id изменяют привычки пользователя, остальные создаются. Изменяемые и
+    связанные привычки загружаются двумя запросами, проверки выполняются по загруженным данным, а сохранение
+    выполняется через bulk_create/bulk_update в одной транзакции. При ошибках ничего не сохраняется,
+    а в ответе возвращаются ошибки каждого элемента.
+    """
+
+    serializer_class = HabitBulkItemSerializer
+    permission_classes = [IsAuthenticated]
+    update_fields = ['name', 'place', 'date_completion', 'action', 'is_pleasant', 'periodicity', 'award',
+                     'execution_time', 'is_public', 'related_habit']
+
+    @staticmethod
+    def to_id(value):
+        """Метод приводит значение к id или возвращает None, если это невозможно."""
+
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def get_ids(self, items, key):
+        """Метод собирает id из значений ключа элементов списка."""
+
+        return {self.to_id(item.get(key)) for item in items} - {None}
+
+    def post(self, request, *args, **kwargs):
+        """Метод проверяет и сохраняет список привычек."""
+
+        items = request.data
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ValidationError({'non_field_errors': ['Ожидается список привычек.']})
+        if len(items) > settings.HABIT_BULK_MAX_ITEMS:
+            raise ValidationError(
+                {'non_field_errors': [f'Не более {settings.HABIT_BULK_MAX_ITEMS} привычек за один запрос.']}
+            )
+        user = request.user
+        instances = Habit.objects.filter(owner=user).in_bulk(self.get_ids(items, 'id'))
+        context = {
+            **self.get_serializer_context(),
+            'related_habits': Habit.objects.in_bulk(self.get_ids(items, 'related_habit_id')),
+        }
+        habits, errors = [], []
+        for item in items:
+            instance = None
+            if item.get('id') is not None:
+                instance = instances.get(self.to_id(item['id']))
+                if instance is None:
+                    habits.append(None)
+                    errors.append({'id': ['Привычка не найдена.']})
+                    continue
+            serializer = self.get_serializer(instance, data=item, context=context)
+            if serializer.is_valid():
+                habits.append((instance, serializer.validated_data))
+                errors.append({})
+            else:
+                habits.append(None)
+                errors.append(serializer.errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return self.save(habits)
+
+    def save(self, habits):
+        """Метод сохраняет проверенные привычки и сбрасывает версии кеша, минуя сигналы сохранения."""
+
+        created, updated, results = [], [], []
+        touches_public = False
+        for instance, validated_data in habits:
+            if instance is None:
+                instance = Habit(**validated_data)
+                created.append(instance)
+            else:
+                touches_public = touches_public or instance.is_public
+                for field, value in validated_data.items():
+                    setattr(instance, field, value)
+                updated.append(instance)
+            touches_public = touches_public or instance.is_public
+            results.append(instance)
+        with transaction.atomic():
+            Habit.objects.bulk_create(created, batch_size=1000)
+            Habit.objects.bulk_update(updated, self.update_fields, batch_size=1000)
+        if touches_public:
+            bump_public_version()
+        bump_user_version(self.request.user.pk)
+        return Response(HabitSerializer(results, many=True).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class OwnedHabitMixin:
+    """Класс-примесь для представлений одной привычки: запрос ограничен привычками текущего пользователя.
+
+    Чужая привычка не находится (404), а проверка IsOwner не требует загрузки владельца.
+    """
+
+    def get_queryset(self):
+        """Метод для изменения запроса к базе данных по объектам модели "Привычки"."""
+
+        return super().get_queryset().filter(owner=self.request.user)
+
+
+class HabitRetrieveAPIView(OwnedHabitMixin, generics.RetrieveAPIView):
     """Класс представления вида Generic для эндпоинта просмотра привычки."""
 
     serializer_class = HabitSerializer
-    queryset = Habit.objects.all()
+    queryset = Habit.objects.select_related('related_habit')
     permission_classes = [IsAuthenticated, IsOwner]
 
+    def get_queryset(self):
+        """Метод выбирает только запрошенные в ?fields= столбцы и не присоединяет связанную привычку без ?expand=."""
+
+        queryset = super().get_queryset()
+        fields, expand = parse_sparse_fields(self.request.query_params)
+        if fields is None:
+            return queryset
+        if 'related_habit' not in expand:
+            queryset = queryset.select_related(None)
+        return queryset.only('owner', *get_values_serializer(fields, expand).columns)
+
+    def get_serializer_context(self):
+        """Метод передает сериализатору запрошенные поля."""
+
+        context = super().get_serializer_context()
+        context['sparse_fields'] = parse_sparse_fields(self.request.query_params)
+        return context
+
+    def retrieve(self, request, *args, **kwargs):
+        """Метод выдачи привычки с условным GET: для ответа 304 достаточно одного запроса наличия привычки."""
+
+        if not self.get_queryset().filter(pk=kwargs['pk']).exists():
+            return super().retrieve(request, *args, **kwargs)
+        etag = get_habit_etag(request, request.user.pk)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
 
 class HabitCreateAPIView(generics.CreateAPIView):
     """Класс представления вида Generic для эндпоинта создания привычки."""
@@ -39,14 +358,12 @@ class HabitCreateAPIView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        """Метод вносит изменение в сериализатор создания "Привычки"."""
+        """Метод сохраняет привычку сразу с владельцем - текущим пользователем."""
 
-        new_habit = serializer.save()
-        new_habit.owner = self.request.user
-        new_habit.save()
+        serializer.save(owner=self.request.user)
 
 
-class HabitUpdateAPIView(generics.UpdateAPIView):
+class HabitUpdateAPIView(OwnedHabitMixin, generics.UpdateAPIView):
     """Класс представления вида Generic для эндпоинта изменения привычки."""
 
     serializer_class = HabitSerializer
@@ -54,8 +371,31 @@ class HabitUpdateAPIView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated, IsOwner]
 
 
-class HabitDestroyAPIView(generics.DestroyAPIView):
+class HabitDestroyAPIView(OwnedHabitMixin, generics.DestroyAPIView):
     """Класс представления вида Generic для эндпоинта удаления привычки."""
 
     queryset = Habit.objects.all()
     permission_classes = [IsAuthenticated, IsOwner]
+
+
+class HabitCompletionAPIView(OwnedHabitMixin, generics.GenericAPIView):
+    """Класс представления вида Generic для отметки выполнения привычки и просмотра ее серий выполнения."""
+
+    serializer_class = HabitCompletionSerializer
+    queryset = Habit.objects.all()
+    permission_classes = [IsAuthenticated, IsOwner]
+
+    def get(self, request, *args, **kwargs):
+        """Метод возвращает счетчики выполнения привычки."""
+
+        return Response(HabitStreakSerializer(self.get_object()).data)
+
+    def post(self, request, *args, **kwargs):
+        """Метод отмечает выполнение привычки за день (по умолчанию - сегодня) и возвращает новые счетчики."""
+
+        habit = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        habit, created = record_completion(habit.pk, serializer.validated_data['date'])
+        return Response(HabitStreakSerializer(habit).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -0,0 +1,126 @@
+import statistics
+import time
+from datetime import datetime, time as datetime_time, timedelta
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Coursework_6_DRF.celery import app
+from habit_tracker.models import Habit, NotificationDelivery
+from users.models import User
+from users.services import NotificationDispatcher, TelegramClient
+from users.tasks import send_habit_notification
+
+
+class TimedTelegramClient(TelegramClient):
+    """ Клиент Telegram, запоминающий длительность каждой отправки """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    def send(self, text, chat_id):
+        started = time.perf_counter()
+        result = super().send(text, chat_id)
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+
+def percentile(values, percent):
+    """ Возвращает перцентиль списка значений """
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест отправки напоминаний на тестовой базе данных с локальной заглушкой Bot API: '
+            'пропускная способность, p50/p99 задержки отправки, число запросов к БД и время на тик')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--habits-per-user', type=int, default=3, help='Привычек на пользователя')
+        parser.add_argument('--ticks', type=int, default=3, help='Количество минутных тиков (слотов)')
+        parser.add_argument('--latency', type=float, default=0.05, help='Задержка ответа заглушки, с')
+        parser.add_argument('--rate-limit-every', type=int, default=0, help='Отвечать 429 на каждый N-й запрос')
+        parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответах 429')
+        parser.add_argument('--global-rate', type=int, default=None, help='Общий лимит сообщений в секунду')
+        parser.add_argument('--chat-rate', type=float, default=None, help='Лимит сообщений в секунду на чат')
+        parser.add_argument('--workers', type=int, default=20, help='Параллельных отправок')
+        parser.add_argument('--keepdb', action='store_true', help='Не удалять тестовую базу данных')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        app.conf.task_always_eager = True
+        try:
+            self.run(options)
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options, start):
+        """ Создает пользователей и привычки, распределенные по минутным слотам """
+        users = User.objects.bulk_create(
+            [User(email=f'bench{number}@bench.local', tg_chat_id=str(number)) for number in range(options['users'])],
+            batch_size=1000
+        )
+        habits = []
+        for number in range(options['users'] * options['habits_per_user']):
+            fire_at = start + timedelta(minutes=number % options['ticks'])
+            local_time = timezone.localtime(fire_at)
+            habits.append(Habit(
+                owner=users[number // options['habits_per_user']], name=f'Привычка {number}', action='Действие',
+                place='Место', date_completion=datetime_time(local_time.hour, local_time.minute), periodicity=1,
+            ))
+        habits = Habit.objects.bulk_create(habits, batch_size=1000)
+        for number, habit in enumerate(habits):
+            habit.next_fire_at = start + timedelta(minutes=number % options['ticks'])
+        Habit.objects.bulk_update(habits, ['next_fire_at'], batch_size=1000)
+        return len(habits)
+
+    def run(self, options):
+        # Заглушка Bot API - часть замеров, а не кода приложения, поэтому импортируется только здесь
+        from benchmarks.fake_bot_api import FakeBotAPIServer
+
+        start = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), datetime_time(7, 0)))
+        total = self.seed(options, start)
+        self.stdout.write(f'Создано привычек: {total}, пользователей: {options["users"]}')
+        with FakeBotAPIServer(latency=options['latency'], rate_limit_every=options['rate_limit_every'],
+                              retry_after=options['retry_after']) as server:
+            client = TimedTelegramClient(base_url=server.base_url, token='bench', pool_size=options['workers'],
+                                         max_workers=options['workers'])
+            rates = {key: options[key] for key in ('global_rate', 'chat_rate') if options[key] is not None}
+            dispatcher = NotificationDispatcher(client, cache=LocMemCache('bench_notifications', {}), **rates)
+            self.stdout.write(f'{"tick":>4} {"due":>7} {"sent":>7} {"failed":>6} {"queries":>7} {"wall, s":>8} '
+                              f'{"retried":>7} {"msg/s":>8} {"p50, ms":>8} {"p99, ms":>8}')
+            with mock.patch('users.services._dispatcher', dispatcher):
+                for tick in range(options['ticks']):
+                    self.run_tick(tick, start + timedelta(minutes=tick, seconds=30), client, server)
+            client.close()
+
+    def run_tick(self, tick, now, client, server):
+        """ Выполняет один запуск планировщика и выводит его показатели """
+        client.latencies = []
+        requests_before = server.requests_count
+        with mock.patch('users.tasks.timezone.now', return_value=now), CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            send_habit_notification()
+            wall = time.perf_counter() - started
+        deliveries = NotificationDelivery.objects.filter(scheduled_for=now - timedelta(seconds=30))
+        due = deliveries.count()
+        sent = deliveries.filter(status=NotificationDelivery.SENT).count()
+        retried = deliveries.filter(attempts__gt=1).count()
+        requests = server.requests_count - requests_before
+        self.stdout.write(
+            f'{tick:>4} {due:>7} {sent:>7} {due - sent:>6} {len(queries):>7} {wall:>8.2f} {retried:>7} '
+            f'{requests / wall:>8.1f} '
+            f'{percentile(client.latencies, 50) * 1000:>8.1f} {percentile(client.latencies, 99) * 1000:>8.1f}'
+        )
+        if client.latencies:
+            self.stdout.write(f'     среднее время отправки: {statistics.mean(client.latencies) * 1000:.1f} ms')
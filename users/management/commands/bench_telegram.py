@@ -0,0 +1,44 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from users.services import TelegramClient
+
+
+class Command(BaseCommand):
+    help = 'Замер скорости отправки уведомлений: последовательно, через пул соединений и параллельно'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Количество сообщений')
+        parser.add_argument('--latency', type=float, default=0.02, help='Задержка ответа заглушки, с')
+        parser.add_argument('--workers', type=int, default=20, help='Количество параллельных отправок')
+
+    def handle(self, *args, **options):
+        # Заглушка Bot API - часть замеров, а не кода приложения, поэтому импортируется только здесь
+        from benchmarks.fake_bot_api import FakeBotAPIServer
+
+        count = options['messages']
+        messages = [(f'Сообщение {number}', str(number)) for number in range(count)]
+        with FakeBotAPIServer(latency=options['latency']) as server:
+            url = f'{server.base_url}test/sendMessage'
+
+            def sequential():
+                for text, chat_id in messages:
+                    requests.get(url, params={'text': text, 'chat_id': chat_id})
+
+            pooled_client = TelegramClient(base_url=server.base_url, token='test', max_workers=1)
+            concurrent_client = TelegramClient(base_url=server.base_url, token='test',
+                                               pool_size=options['workers'], max_workers=options['workers'])
+            modes = [
+                ('sequential', sequential),
+                ('pooled', lambda: pooled_client.send_batch(messages)),
+                ('concurrent', lambda: concurrent_client.send_batch(messages)),
+            ]
+            for name, run in modes:
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{name:<12} {count / elapsed:10.1f} msg/s  ({elapsed:.3f} s)')
+            pooled_client.close()
+            concurrent_client.close()
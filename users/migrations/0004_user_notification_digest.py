@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_telegram_nickname'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_digest',
+            field=models.BooleanField(blank=True, help_text='Если не указано, используется настройка HABIT_NOTIFICATION_DIGEST', null=True, verbose_name='Объединять напоминания в дайджест'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
 from django.core.validators import FileExtensionValidator, RegexValidator
 from django.db import models
@@ -75,6 +76,12 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    notification_digest = models.BooleanField(
+        verbose_name='Объединять напоминания в дайджест',
+        help_text='Если не указано, используется настройка HABIT_NOTIFICATION_DIGEST',
+        blank=True,
+        null=True
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -86,6 +93,14 @@ class User(AbstractUser):
 
         return self.email
 
+    @property
+    def wants_digest(self):
+        """Признак отправки напоминаний пользователю одним сообщением-дайджестом."""
+
+        if self.notification_digest is None:
+            return settings.HABIT_NOTIFICATION_DIGEST
+        return self.notification_digest
+
     class Meta:
         """Класс для изменения поведения полей модели "Пользователь"."""
 
@@ -7,7 +7,7 @@ class IsOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         """Метод для проверки прав доступа у пользователя на объект."""
 
-        if obj.owner == request.user:
+        if obj.owner_id == request.user.pk:
             return True
         return False
 
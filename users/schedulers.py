@@ -0,0 +1,111 @@
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache as default_cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.utils import timezone
+from django_celery_beat.schedulers import DatabaseScheduler
+
+from habit_tracker.models import SchedulerLease
+from users.throttling import CacheLock
+
+
+class LeaderLease:
+    """ Аренда лидерства на время ttl, хранящаяся в общем кеше Django (Redis в продакшене).
+
+    Лидер продлевает аренду при каждом вызове acquire; если он перестал это делать,
+    лидерство переходит к другому экземпляру не позже чем через ttl секунд.
+    """
+
+    def __init__(self, name, ttl, owner=None, cache=None):
+        self.key = f'leader:{name}'
+        self.ttl = ttl
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+        self.cache = cache or default_cache
+
+    def acquire(self):
+        """ Получает или продлевает аренду; возвращает True, если текущий экземпляр - лидер """
+        with CacheLock(self.cache, f'{self.key}:lock', timeout=5, poll_interval=0.01):
+            current = self.cache.get(self.key)
+            if current is None:
+                self.cache.set(self.key, self.owner, timeout=self.ttl)
+                return True
+            if current == self.owner:
+                self.cache.touch(self.key, timeout=self.ttl)
+                return True
+            return False
+
+    def release(self):
+        """ Освобождает аренду, если она принадлежит текущему экземпляру """
+        with CacheLock(self.cache, f'{self.key}:lock', timeout=5, poll_interval=0.01):
+            if self.cache.get(self.key) == self.owner:
+                self.cache.delete(self.key)
+
+
+class DatabaseLeaderLease:
+    """ Аренда лидерства на время ttl, хранящаяся строкой в базе данных, общей для всех экземпляров.
+
+    Используется, когда кеш Django не общий для процессов (LocMemCache): аренда в таком кеше есть у каждого
+    экземпляра. Срок аренды сравнивается с часами базы данных, чтобы расхождение часов контейнеров не влияло
+    на выбор лидера.
+    """
+
+    def __init__(self, name, ttl, owner=None):
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+
+    def acquire(self):
+        """ Получает или продлевает аренду; возвращает True, если текущий экземпляр - лидер """
+        leases = SchedulerLease.objects.filter(Q(owner=self.owner) | Q(expires_at__lte=Now()), name=self.name)
+        if leases.update(owner=self.owner, expires_at=Now() + timedelta(seconds=self.ttl)):
+            return True
+        try:
+            with transaction.atomic():
+                SchedulerLease.objects.create(name=self.name, owner=self.owner,
+                                              expires_at=timezone.now() + timedelta(seconds=self.ttl))
+        except IntegrityError:
+            return False
+        return True
+
+    def release(self):
+        """ Освобождает аренду, если она принадлежит текущему экземпляру """
+        SchedulerLease.objects.filter(name=self.name, owner=self.owner).delete()
+
+
+def get_leader_lease(name, ttl, cache=None):
+    """ Возвращает аренду в общем кеше или, если кеш локален для процесса, в базе данных """
+    cache = cache or caches['default']
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return DatabaseLeaderLease(name, ttl)
+    return LeaderLease(name, ttl, cache=cache)
+
+
+class LeaderDatabaseScheduler(DatabaseScheduler):
+    """ Планировщик celery beat, который отправляет задачи только у экземпляра-лидера.
+
+    Позволяет запускать несколько контейнеров celery_beat: остальные экземпляры ждут
+    и забирают лидерство после истечения аренды.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.lease = get_leader_lease('celery_beat', settings.CELERY_BEAT_LEADER_LEASE)
+        super().__init__(*args, **kwargs)
+
+    def tick(self, *args, **kwargs):
+        """ Выполняет шаг планировщика, если текущий экземпляр - лидер """
+        renew_interval = self.lease.ttl / 3
+        if not self.lease.acquire():
+            return renew_interval
+        return min(super().tick(*args, **kwargs), renew_interval)
+
+    def close(self):
+        """ Освобождает лидерство при остановке, чтобы другой экземпляр перехватил его сразу """
+        self.lease.release()
+        super().close()
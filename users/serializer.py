@@ -9,7 +9,7 @@ class ProfileUserSerializer(serializers.ModelSerializer):
         """Класс для изменения поведения полей сериализатора модели "Пользователь"."""
 
         model = User
-        fields = ['avatar', 'email', 'telegram_nickname', 'tg_chat_id', 'city']
+        fields = ['avatar', 'email', 'telegram_nickname', 'tg_chat_id', 'notification_digest', 'city']
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -1,19 +1,180 @@
+import heapq
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 import requests
 from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from Coursework_6_DRF.settings import (BOT_TOKEN, TG_URL, TG_MAX_WORKERS, TG_POOL_SIZE, TG_TIMEOUT, TG_GLOBAL_RATE,
+                                       TG_CHAT_RATE, TG_MAX_RATE_DELAY, TG_RETRY_BASE_DELAY, TG_RETRY_MAX_DELAY)
+from users.throttling import TokenBucket
 
-from Coursework_6_DRF.settings import BOT_TOKEN, TG_URL
+logger = logging.getLogger(__name__)
 
 bot_token = BOT_TOKEN
 
 
+@dataclass
+class NotificationResult:
+    """ Результат отправки одного сообщения в Telegram """
+    chat_id: str
+    ok: bool
+    status_code: int | None = None
+    error: str | None = None
+    retry_after: float | None = None
+
+    @property
+    def retryable(self):
+        """ Признак временной ошибки, после которой отправку стоит повторить """
+        return not self.ok and (self.status_code is None or self.status_code == 429 or self.status_code >= 500)
+
+
+class TelegramClient:
+    """ Клиент Telegram Bot API с постоянным пулом соединений и ограниченной параллельностью """
+
+    def __init__(self, base_url=TG_URL, token=bot_token, pool_size=TG_POOL_SIZE, max_workers=TG_MAX_WORKERS,
+                 timeout=TG_TIMEOUT):
+        self.url = f'{base_url}{token}/sendMessage'
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def send(self, text, chat_id):
+        """ Отправляет одно сообщение через общий пул соединений """
+        try:
+            response = self.session.get(self.url, params={'text': text, 'chat_id': chat_id}, timeout=self.timeout)
+            response.raise_for_status()
+        except RequestException as e:
+            if e.response is None:
+                return NotificationResult(chat_id, False, None, str(e))
+            return NotificationResult(chat_id, False, e.response.status_code, str(e), get_retry_after(e.response))
+        return NotificationResult(chat_id, True, response.status_code)
+
+    def send_batch(self, messages):
+        """ Параллельно отправляет пары (текст, chat_id) и возвращает результаты в исходном порядке """
+        if self.max_workers <= 1 or len(messages) <= 1:
+            return [self.send(text, chat_id) for text, chat_id in messages]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(messages))) as executor:
+            return list(executor.map(lambda message: self.send(*message), messages))
+
+    def close(self):
+        """ Закрывает соединения пула """
+        self.session.close()
+
+
+def get_retry_after(response):
+    """ Возвращает retry_after из ответа Bot API с кодом 429 """
+    if response.status_code != 429:
+        return None
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        return float(response.headers.get('Retry-After', 1))
+
+
+def get_retry_delay(attempt, retry_after=None):
+    """ Возвращает задержку повторной отправки с экспоненциальным ростом """
+    return max(min(TG_RETRY_BASE_DELAY * 2 ** attempt, TG_RETRY_MAX_DELAY), retry_after or 0)
+
+
+class NotificationDispatcher:
+    """ Отправка уведомлений с ограничением частоты: общая корзина токенов и корзина на каждый чат """
+
+    def __init__(self, client, global_rate=TG_GLOBAL_RATE, chat_rate=TG_CHAT_RATE, cache=None, clock=time.time,
+                 sleep=time.sleep):
+        self.client = client
+        self.global_bucket = TokenBucket('tg:bucket:global', global_rate, capacity=global_rate, cache=cache,
+                                         clock=clock)
+        self.chat_rate = chat_rate
+        self.cache = cache
+        self.clock = clock
+        self.sleep = sleep
+
+    def chat_bucket(self, chat_id):
+        """ Возвращает корзину токенов чата """
+        return TokenBucket(f'tg:bucket:chat:{chat_id}', self.chat_rate, cache=self.cache, clock=self.clock)
+
+    def dispatch(self, messages, max_delay=TG_MAX_RATE_DELAY):
+        """ Отправляет пары (текст, chat_id) не быстрее разрешенной частоты.
+
+        Токены чатов резервируются сразу, и каждое сообщение получает момент, раньше которого его нельзя
+        отправить. Сообщения отправляются по очереди этих моментов, а поток отправки ждет только общую корзину
+        или ближайший момент, поэтому очередь сообщений в один чат не задерживает сообщения в другие чаты.
+        Сообщения, для которых токен не освобождается за max_delay секунд, не отправляются
+        и возвращаются как временная ошибка с retry_after.
+        """
+        results = [None] * len(messages)
+        started = self.clock()
+        ready = []
+        chat_buckets = {}
+        for index, (text, chat_id) in enumerate(messages):
+            chat_bucket = chat_buckets.setdefault(chat_id, self.chat_bucket(chat_id))
+            delay = chat_bucket.reserve(max(max_delay - (self.clock() - started), 0))
+            if self.clock() + delay - started > max_delay:
+                results[index] = NotificationResult(chat_id, False, error='Превышен лимит частоты', retry_after=delay)
+                continue
+            heapq.heappush(ready, (self.clock() + delay, index))
+        with ThreadPoolExecutor(max_workers=max(self.client.max_workers, 1)) as executor:
+            futures = {}
+            while ready:
+                not_before, index = heapq.heappop(ready)
+                text, chat_id = messages[index]
+                if not_before > self.clock():
+                    self.sleep(not_before - self.clock())
+                budget = max(max_delay - (self.clock() - started), 0)
+                delay = self.global_bucket.reserve(budget)
+                if delay > budget:
+                    chat_buckets[chat_id].cancel()
+                    results[index] = NotificationResult(chat_id, False, error='Превышен лимит частоты', retry_after=delay)
+                    continue
+                if delay:
+                    self.sleep(delay)
+                futures[index] = executor.submit(self.client.send, text, chat_id)
+            for index, future in futures.items():
+                results[index] = future.result()
+                if results[index].retry_after:
+                    chat_buckets[results[index].chat_id].pause(results[index].retry_after)
+        return results
+
+
+_client = None
+_dispatcher = None
+
+
+def get_telegram_client():
+    """ Возвращает клиент Telegram, общий для процесса """
+    global _client
+    if _client is None:
+        _client = TelegramClient()
+    return _client
+
+
+def get_dispatcher():
+    """ Возвращает диспетчер уведомлений, общий для процесса """
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher(get_telegram_client())
+    return _dispatcher
+
+
 def send_notification(text, chat_id):
     """ Отправляет сообщение через Telegram """
-    params = {
-        'text': text,
-        'chat_id': chat_id
-    }
-    try:
-        response = requests.get(f'{TG_URL}{bot_token}/sendMessage', params=params)
-        response.raise_for_status()
-    except RequestException as e:
-        print(f'Ошибка при отправке  уведомления: {e}')
+    result = get_telegram_client().send(text, chat_id)
+    if not result.ok:
+        logger.warning('Ошибка при отправке уведомления в чат %s: %s', chat_id, result.error)
+    return result
+
+
+def send_notifications(messages, max_delay=TG_MAX_RATE_DELAY):
+    """ Отправляет пачку сообщений (текст, chat_id) через Telegram с ограничением частоты """
+    results = get_dispatcher().dispatch(messages, max_delay)
+    for result in results:
+        if not result.ok:
+            logger.warning('Ошибка при отправке уведомления в чат %s: %s', result.chat_id, result.error)
+    return results
@@ -1,19 +1,35 @@
-from datetime import datetime
-from celery import shared_task
-from users.services import send_notification
-from habit_tracker.models import Habit
+import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+from celery import group, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from users.services import get_retry_delay, send_notifications
+from habit_tracker.models import Habit, NotificationDelivery, SchedulerState
+from habit_tracker.scheduling import advance_fire_at
 
 
-@shared_task
-def send_habit_notification():
-    """ Отправляет уведомление о выполнении привычке """
-    hour_now = datetime.now().hour
-    minute_now = datetime.now().minute
-    habits = Habit.objects.filter(date_completion__hour=hour_now, date_completion__minute=minute_now)
-    for habit in habits:
-        reward_or_related_habit = habit.award if habit.award else (
-            habit.related_habit.name if habit.related_habit else "Никакого вознаграждения или связанной с ним привычки")
-        message = f'''Дружеское напоминание.
+logger = logging.getLogger(__name__)
+
+REMINDER_SCHEDULER = 'habit_reminders'
+REMINDER_LAG_CACHE_KEY = 'habit_reminders:lag'
+CHUNK_HARD_TIME_LIMIT = settings.HABIT_NOTIFICATION_CHUNK_TIME_LIMIT + 5
+
+
+def get_reward_or_related_habit(habit):
+    """ Возвращает вознаграждение за привычку или связанную с ней приятную привычку """
+    return habit.award if habit.award else (
+        habit.related_habit.name if habit.related_habit else "Никакого вознаграждения или связанной с ним привычки")
+
+
+def get_habit_message(habit):
+    """ Формирует текст напоминания о привычке """
+    reward_or_related_habit = get_reward_or_related_habit(habit)
+    return f'''Дружеское напоминание.
     Ваша привычка {habit.name}:
     Действие: {habit.action},
     Место: {habit.place},
@@ -21,6 +37,233 @@ def send_habit_notification():
     Награда или приятная привычка: {reward_or_related_habit}
     Время выполнения: {habit.execution_time}
 Удачи!'''
-        send_notification(message, habit.owner.tg_chat_id)
-        print(f'{habit.owner} - {habit.action} - {habit.place} отправить '
-              f'{habit.owner} ({habit.owner.telegram_nickname})')
+
+
+def get_digest_message(habits):
+    """ Формирует один текст напоминания сразу о нескольких привычках пользователя """
+    lines = '\n'.join(
+        f'    {number}. {habit.name}: {habit.action}, {habit.place}, {habit.date_completion} '
+        f'({habit.execution_time}), награда или приятная привычка: {get_reward_or_related_habit(habit)}'
+        for number, habit in enumerate(habits, start=1)
+    )
+    return f'''Дружеское напоминание.
+    Ваши привычки на это время:
+{lines}
+Удачи!'''
+
+
+def split_into_ranges(keys, chunk_size):
+    """ Разбивает упорядоченный список ключей на диапазоны (первый, последний) примерно фиксированного размера.
+
+    Одинаковые ключи не разносятся по разным диапазонам.
+    """
+    ranges = []
+    start = 0
+    while start < len(keys):
+        end = min(start + chunk_size, len(keys))
+        while end < len(keys) and keys[end] == keys[end - 1]:
+            end += 1
+        ranges.append((keys[start], keys[end - 1]))
+        start = end
+    return ranges
+
+
+def group_messages(deliveries):
+    """ За один проход по отсортированным по владельцу записям журнала формирует сообщения и записи к ним.
+
+    Пользователи в режиме дайджеста получают одно сообщение на все свои напоминания. Если у привычки ожидают
+    отправки несколько слотов, каждый слот отправляется и завершается отдельно.
+    """
+    groups = []
+    for owner, owner_deliveries in groupby(deliveries, key=lambda delivery: delivery.habit.owner):
+        owner_deliveries = list(owner_deliveries)
+        if owner.wants_digest and len(owner_deliveries) > 1:
+            habits = [delivery.habit for delivery in owner_deliveries]
+            groups.append(((get_digest_message(habits), owner.tg_chat_id), owner_deliveries))
+        else:
+            groups.extend(((get_habit_message(delivery.habit), owner.tg_chat_id), [delivery])
+                          for delivery in owner_deliveries)
+    return groups
+
+
+def finish_deliveries(messages, results, message_deliveries, attempt=0):
+    """ Массово сохраняет статусы отправок и ставит в очередь повтора сообщения с временной ошибкой.
+
+    Для записей, ожидающих повтора, в claimed_at сохраняется время запланированного повтора: по нему
+    requeue_stale_deliveries находит записи, задача повтора которых потерялась.
+    Возвращает количество отправленных напоминаний.
+    """
+    now = timezone.now()
+    finished = []
+    retries = []
+    for (text, chat_id), result, deliveries in zip(messages, results, message_deliveries):
+        claimed_at = None
+        if result.ok:
+            status, error = NotificationDelivery.SENT, None
+        elif result.retryable and attempt < settings.TG_RETRY_MAX_ATTEMPTS:
+            status, error = NotificationDelivery.RETRYING, result.error
+            countdown = get_retry_delay(attempt, result.retry_after)
+            claimed_at = now + timedelta(seconds=countdown)
+            retries.append(((text, chat_id, attempt + 1, [delivery.pk for delivery in deliveries]), countdown))
+        else:
+            status, error = NotificationDelivery.FAILED, result.error
+        for delivery in deliveries:
+            delivery.status = status
+            delivery.error = error
+            delivery.sent_at = now if result.ok else None
+            delivery.claimed_at = claimed_at
+            finished.append(delivery)
+    NotificationDelivery.objects.bulk_update(finished, ['status', 'error', 'sent_at', 'claimed_at'], batch_size=1000)
+    for args, countdown in retries:
+        retry_notification.apply_async(args, countdown=countdown)
+    return sum(len(deliveries) for result, deliveries in zip(results, message_deliveries) if result.ok)
+
+
+def claim_deliveries(queryset):
+    """ Захватывает записи журнала отправок, чтобы одно напоминание не отправили дважды """
+    with transaction.atomic():
+        deliveries = list(queryset.select_for_update(skip_locked=True, of=('self',)))
+        NotificationDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+            status=NotificationDelivery.SENDING, attempts=F('attempts') + 1, claimed_at=timezone.now()
+        )
+    return deliveries
+
+
+def requeue_deliveries(queryset):
+    """ Возвращает записи журнала в очередь, а записи, исчерпавшие попытки, помечает ошибкой.
+
+    Первая отправка и TG_RETRY_MAX_ATTEMPTS повторов вместе дают TG_RETRY_MAX_ATTEMPTS + 1 попыток.
+    Возвращает количество возвращенных в очередь и помеченных ошибкой записей.
+    """
+    failed = queryset.filter(attempts__gt=settings.TG_RETRY_MAX_ATTEMPTS).update(
+        status=NotificationDelivery.FAILED, error='Отправка прервана', claimed_at=None
+    )
+    requeued = queryset.update(status=NotificationDelivery.PENDING, claimed_at=None)
+    return requeued, failed
+
+
+def release_deliveries(deliveries):
+    """ Возвращает в очередь захваченные записи, по которым отправка не завершилась.
+
+    Сообщение могло уйти до прерывания, поэтому напоминание может прийти повторно, но не теряется.
+    Записи, исчерпавшие попытки, помечаются ошибкой. Возвращает количество возвращенных в очередь записей.
+    """
+    requeued, failed = requeue_deliveries(NotificationDelivery.objects.filter(
+        pk__in=[delivery.pk for delivery in deliveries], status=NotificationDelivery.SENDING
+    ))
+    return requeued
+
+
+def get_stale_owner_ids(now):
+    """ Возвращает id владельцев, у которых напоминания ожидают отправки дольше жесткого лимита подзадачи.
+
+    Такие записи остались после долгого ожидания подзадачи в очереди или были возвращены в очередь после
+    сбоя, поэтому их диапазоны планируются снова, даже если у владельцев нет наступивших привычек.
+    """
+    return set(
+        NotificationDelivery.objects.filter(
+            status=NotificationDelivery.PENDING, scheduled_for__lte=now - timedelta(seconds=CHUNK_HARD_TIME_LIMIT)
+        ).values_list('habit__owner_id', flat=True).distinct()
+    )
+
+
+@shared_task
+def send_habit_notification():
+    """ Планирует отправку наступивших напоминаний группой подзадач по диапазонам id владельцев.
+
+    Обрабатывается полуоткрытый интервал (отметка прошлого запуска, сейчас], поэтому после медленного запуска
+    или перезапуска beat пропущенные минуты догоняются одним запросом по диапазону. Для каждой привычки
+    создается запись журнала отправок за ее слот, а ближайшее напоминание переносится на следующий период.
+    Слоты старше отметки с запасом перекрытия (простой beat, восстановление из копии) не отправляются,
+    но ближайшее напоминание таких привычек тоже переносится, чтобы они продолжили срабатывать.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        state, created = SchedulerState.objects.select_for_update().get_or_create(
+            name=REMINDER_SCHEDULER, defaults={'watermark': now}
+        )
+        habits = list(
+            Habit.objects.filter(next_fire_at__lte=now).only('id', 'owner_id', 'next_fire_at', 'periodicity')
+            .order_by('owner_id', 'id')
+        )
+        due = [habit for habit in habits if habit.owner_id is not None]
+        if not created:
+            missed_before = state.watermark - timedelta(seconds=settings.HABIT_NOTIFICATION_WATERMARK_OVERLAP)
+            due = [habit for habit in due if habit.next_fire_at > missed_before]
+        NotificationDelivery.objects.bulk_create(
+            [NotificationDelivery(habit_id=habit.id, scheduled_for=habit.next_fire_at) for habit in due],
+            ignore_conflicts=True, batch_size=1000
+        )
+        lag = max(now - min((habit.next_fire_at for habit in due), default=now), timedelta(0))
+        for habit in habits:
+            habit.next_fire_at = advance_fire_at(habit.next_fire_at, habit.periodicity, now)
+        Habit.objects.bulk_update(habits, ['next_fire_at'], batch_size=1000)
+        state.watermark = now
+        state.lag = lag
+        state.save(update_fields=['watermark', 'lag', 'updated_at'])
+    cache.set(REMINDER_LAG_CACHE_KEY, lag.total_seconds(), timeout=None)
+    logger.info('Отставание планировщика напоминаний: %.0f с', lag.total_seconds())
+    owner_ids = sorted({habit.owner_id for habit in due} | get_stale_owner_ids(now))
+    ranges = split_into_ranges(owner_ids, settings.HABIT_NOTIFICATION_CHUNK_SIZE)
+    if ranges:
+        group(
+            send_habit_notification_chunk.s(now.isoformat(), first_id, last_id) for first_id, last_id in ranges
+        ).apply_async()
+    return len(ranges)
+
+
+@shared_task(soft_time_limit=settings.HABIT_NOTIFICATION_CHUNK_TIME_LIMIT, time_limit=CHUNK_HARD_TIME_LIMIT)
+def send_habit_notification_chunk(fire_before, first_id, last_id):
+    """ Отправляет ожидающие в журнале напоминания владельцам из диапазона id """
+    now = datetime.fromisoformat(fire_before)
+    deliveries = claim_deliveries(
+        NotificationDelivery.objects.filter(
+            status=NotificationDelivery.PENDING, scheduled_for__lte=now,
+            habit__owner_id__gte=first_id, habit__owner_id__lte=last_id
+        ).select_related('habit__owner', 'habit__related_habit').order_by('habit__owner_id', 'habit_id',
+                                                                          'scheduled_for')
+    )
+    sent = 0
+    try:
+        groups = group_messages(deliveries)
+        messages = [message for message, message_deliveries in groups]
+        results = send_notifications(messages)
+        sent = finish_deliveries(messages, results, [message_deliveries for message, message_deliveries in groups])
+        for (message, message_deliveries), result in zip(groups, results):
+            for habit in (delivery.habit for delivery in message_deliveries):
+                if result.ok:
+                    logger.debug('%s - %s - %s отправлено %s (%s)', habit.owner, habit.action, habit.place,
+                                 habit.owner, habit.owner.telegram_nickname)
+    except SoftTimeLimitExceeded:
+        released = release_deliveries(deliveries)
+        logger.warning('Превышен лимит времени для владельцев %s-%s: отправлено %s, возвращено в очередь %s',
+                       first_id, last_id, sent, released)
+    return sent
+
+
+@shared_task
+def requeue_stale_deliveries():
+    """ Возвращает в очередь записи, зависшие после аварийного завершения воркера или потери задачи повтора.
+
+    Запись в статусе отправки считается зависшей, если захвачена раньше жесткого лимита времени подзадачи,
+    запись в статусе повтора - если повтор не начался за то же время после запланированного. Записи,
+    исчерпавшие попытки, помечаются ошибкой.
+    """
+    return requeue_deliveries(NotificationDelivery.objects.filter(
+        status__in=[NotificationDelivery.SENDING, NotificationDelivery.RETRYING],
+        claimed_at__lt=timezone.now() - timedelta(seconds=CHUNK_HARD_TIME_LIMIT)
+    ))
+
+
+@shared_task
+def retry_notification(text, chat_id, attempt, delivery_ids=()):
+    """ Повторно отправляет сообщение после временной ошибки с экспоненциальной задержкой """
+    deliveries = claim_deliveries(
+        NotificationDelivery.objects.filter(pk__in=delivery_ids, status=NotificationDelivery.RETRYING)
+    )
+    if delivery_ids and not deliveries:
+        return False
+    messages = [(text, chat_id)]
+    results = send_notifications(messages)
+    finish_deliveries(messages, results, [deliveries], attempt)
+    return results[0].ok
@@ -1,7 +1,21 @@
+from datetime import datetime, time, timedelta
+from unittest import mock
 from rest_framework import status
 from rest_framework.reverse import reverse
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework.test import APITestCase
+from habit_tracker.models import Habit, NotificationDelivery, SchedulerLease, SchedulerState
+from benchmarks.fake_bot_api import FakeBotAPIServer
 from users.models import User
+from users.schedulers import DatabaseLeaderLease, LeaderDatabaseScheduler, LeaderLease, get_leader_lease
+from users.services import NotificationDispatcher, NotificationResult, TelegramClient, send_notifications
+from celery.exceptions import SoftTimeLimitExceeded
+from users.tasks import (REMINDER_LAG_CACHE_KEY, REMINDER_SCHEDULER, requeue_stale_deliveries, retry_notification,
+                         send_habit_notification, split_into_ranges)
+from users.throttling import TokenBucket
 
 
 class TestCase(APITestCase):
@@ -74,3 +88,403 @@ class ProfileTestCase(TestCase, APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(User.objects.count(), 0)
+
+
+def fake_send_notifications(messages):
+    """Имитирует успешную отправку пачки сообщений."""
+
+    return [NotificationResult(chat_id, True, 200) for text, chat_id in messages]
+
+
+class HabitNotificationTestCase(APITestCase):
+    """Тесты задачи отправки напоминаний о привычках."""
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+
+        self.now = timezone.make_aware(datetime(2025, 5, 12, 7, 30))
+        self.user = User.objects.create(email="tg_user@sky.pro", tg_chat_id="100")
+        self.habit = self.create_habit(name="Зарядка", action="Приседания", periodicity=2)
+        self.create_habit(name="Чтение", action="Читать", fire_at=self.now + timedelta(minutes=1))
+
+    def create_habit(self, fire_at=None, owner=None, **kwargs):
+        """Создает привычку с заданным моментом ближайшего напоминания."""
+
+        habit = Habit.objects.create(owner=owner or self.user, date_completion=time(7, 30), **kwargs)
+        Habit.objects.filter(pk=habit.pk).update(next_fire_at=fire_at or self.now)
+        return habit
+
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_send_habit_notification(self, mock_send):
+        """Тест отправки только наступивших напоминаний и переноса их на следующий период."""
+
+        with mock.patch("users.tasks.timezone.now", return_value=self.now + timedelta(seconds=45)):
+            send_habit_notification()
+        mock_send.assert_called_once()
+        [(message, chat_id)] = mock_send.call_args.args[0]
+        self.assertIn("Зарядка", message)
+        self.assertEqual(chat_id, "100")
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_fire_at, self.now + timedelta(days=2))
+
+    @override_settings(HABIT_NOTIFICATION_CHUNK_SIZE=2)
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_send_habit_notification_chunks(self, mock_send):
+        """Тест разбиения напоминаний на подзадачи по диапазонам id владельцев."""
+
+        for number in range(4):
+            owner = User.objects.create(email=f"user{number}@sky.pro", tg_chat_id=str(number))
+            self.create_habit(name=f"Привычка {number}", owner=owner)
+        with mock.patch("users.tasks.timezone.now", return_value=self.now):
+            self.assertEqual(send_habit_notification(), 3)
+        self.assertEqual(mock_send.call_count, 3)
+        self.assertEqual(sum(len(call.args[0]) for call in mock_send.call_args_list), 5)
+
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_delivery_log(self, mock_send):
+        """Тест журнала отправок: запись за слот создается один раз и повторно не отправляется."""
+
+        NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now, status=NotificationDelivery.SENT)
+        other = self.create_habit(name="Медитация")
+        with mock.patch("users.tasks.timezone.now", return_value=self.now):
+            send_habit_notification()
+            send_habit_notification()
+        mock_send.assert_called_once()
+        delivery = NotificationDelivery.objects.get(habit=other)
+        self.assertEqual((delivery.status, delivery.attempts, delivery.scheduled_for),
+                         (NotificationDelivery.SENT, 1, self.now))
+        self.assertEqual(NotificationDelivery.objects.count(), 2)
+
+    @mock.patch("users.tasks.send_notifications")
+    def test_delivery_retry(self, mock_send):
+        """Тест повторной отправки по журналу после временной ошибки."""
+
+        mock_send.side_effect = [
+            [NotificationResult("100", False, 503, "Service Unavailable")],
+            [NotificationResult("100", True, 200)],
+        ]
+        with mock.patch("users.tasks.timezone.now", return_value=self.now):
+            send_habit_notification()
+        delivery = NotificationDelivery.objects.get(habit=self.habit)
+        self.assertEqual((delivery.status, delivery.attempts), (NotificationDelivery.SENT, 2))
+        self.assertIsNotNone(delivery.latency)
+
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_several_pending_slots(self, mock_send):
+        """Тест отправки и завершения каждого ожидающего слота одной привычки."""
+
+        earlier = NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now - timedelta(days=2))
+        with mock.patch("users.tasks.timezone.now", return_value=self.now):
+            send_habit_notification()
+        self.assertEqual(len(mock_send.call_args.args[0]), 2)
+        deliveries = NotificationDelivery.objects.filter(habit=self.habit).order_by('scheduled_for')
+        self.assertEqual([delivery.pk for delivery in deliveries][0], earlier.pk)
+        self.assertEqual([delivery.status for delivery in deliveries], [NotificationDelivery.SENT] * 2)
+
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_stale_pending_dispatched(self, mock_send):
+        """Тест отправки с опозданием записей, оставшихся в очереди, у владельца без наступивших привычек."""
+
+        other = User.objects.create(email="late@sky.pro", tg_chat_id="300")
+        habit = self.create_habit(name="Поздняя", owner=other, fire_at=self.now + timedelta(days=1))
+        delivery = NotificationDelivery.objects.create(habit=habit, scheduled_for=self.now - timedelta(hours=1))
+        with mock.patch("users.tasks.timezone.now", return_value=self.now):
+            send_habit_notification()
+        self.assertIn("300", [chat_id for text, chat_id in mock_send.call_args.args[0]])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, NotificationDelivery.SENT)
+
+    @mock.patch("users.tasks.send_notifications", side_effect=SoftTimeLimitExceeded)
+    def test_soft_time_limit_releases_deliveries(self, mock_send):
+        """Тест возврата захваченных записей в очередь при превышении лимита времени подзадачи."""
+
+        with mock.patch("users.tasks.timezone.now", return_value=self.now), \
+                self.assertLogs("users.tasks", level="WARNING"):
+            send_habit_notification()
+        delivery = NotificationDelivery.objects.get(habit=self.habit)
+        self.assertEqual((delivery.status, delivery.attempts, delivery.claimed_at),
+                         (NotificationDelivery.PENDING, 1, None))
+
+    def test_requeue_stale_deliveries(self):
+        """Тест возврата в очередь записей, зависших в статусе отправки."""
+
+        claimed_at = timezone.now() - timedelta(minutes=10)
+        stale = NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now, attempts=1,
+                                                    status=NotificationDelivery.SENDING, claimed_at=claimed_at)
+        exhausted = NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now - timedelta(days=2),
+                                                        status=NotificationDelivery.SENDING, claimed_at=claimed_at,
+                                                        attempts=100)
+        fresh = NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now - timedelta(days=4),
+                                                    status=NotificationDelivery.SENDING, claimed_at=timezone.now())
+        lost_retry = NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now - timedelta(days=6),
+                                                         status=NotificationDelivery.RETRYING, claimed_at=claimed_at,
+                                                         attempts=2)
+        waiting_retry = NotificationDelivery.objects.create(
+            habit=self.habit, scheduled_for=self.now - timedelta(days=8), status=NotificationDelivery.RETRYING,
+            claimed_at=timezone.now() + timedelta(minutes=1), attempts=2
+        )
+        self.assertEqual(requeue_stale_deliveries(), (2, 1))
+        statuses = [NotificationDelivery.objects.get(pk=delivery.pk).status
+                    for delivery in (stale, exhausted, fresh, lost_retry, waiting_retry)]
+        self.assertEqual(statuses, [NotificationDelivery.PENDING, NotificationDelivery.FAILED,
+                                    NotificationDelivery.SENDING, NotificationDelivery.PENDING,
+                                    NotificationDelivery.RETRYING])
+
+    @mock.patch("users.tasks.retry_notification.apply_async")
+    @mock.patch("users.tasks.send_notifications")
+    def test_retrying_delivery_stores_retry_time(self, mock_send, mock_retry):
+        """Тест сохранения времени запланированного повтора, по которому находятся потерянные повторы."""
+
+        mock_send.return_value = [NotificationResult("100", False, 429, "Too Many Requests", 30)]
+        with mock.patch("users.tasks.timezone.now", return_value=self.now):
+            send_habit_notification()
+        delivery = NotificationDelivery.objects.get(habit=self.habit)
+        self.assertEqual((delivery.status, delivery.claimed_at),
+                         (NotificationDelivery.RETRYING, self.now + timedelta(seconds=30)))
+        self.assertEqual(mock_retry.call_args.kwargs, {'countdown': 30})
+
+    @mock.patch("users.tasks.send_notifications", side_effect=SoftTimeLimitExceeded)
+    def test_soft_time_limit_fails_exhausted_deliveries(self, mock_send):
+        """Тест пометки ошибкой прерванной записи, исчерпавшей попытки."""
+
+        NotificationDelivery.objects.create(habit=self.habit, scheduled_for=self.now,
+                                            attempts=settings.TG_RETRY_MAX_ATTEMPTS)
+        with mock.patch("users.tasks.timezone.now", return_value=self.now), \
+                self.assertLogs("users.tasks", level="WARNING"):
+            send_habit_notification()
+        delivery = NotificationDelivery.objects.get(habit=self.habit)
+        self.assertEqual((delivery.status, delivery.attempts, delivery.claimed_at),
+                         (NotificationDelivery.FAILED, settings.TG_RETRY_MAX_ATTEMPTS + 1, None))
+
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_watermark_catch_up(self, mock_send):
+        """Тест догоняющей обработки пропущенных минут одним запуском и расчета отставания."""
+
+        SchedulerState.objects.create(name=REMINDER_SCHEDULER, watermark=self.now - timedelta(minutes=10))
+        Habit.objects.filter(pk=self.habit.pk).update(next_fire_at=self.now - timedelta(minutes=9))
+        self.create_habit(name="Медитация", fire_at=self.now - timedelta(minutes=3))
+        stale = self.create_habit(name="Устаревшая", fire_at=self.now - timedelta(days=1))
+        with mock.patch("users.tasks.timezone.now", return_value=self.now), \
+                self.assertLogs("users.tasks", level="INFO") as logs:
+            send_habit_notification()
+        self.assertIn("Отставание планировщика напоминаний: 540 с", logs.output[0])
+        self.assertEqual(sum(len(call.args[0]) for call in mock_send.call_args_list), 2)
+        stale.refresh_from_db()
+        self.assertEqual(stale.next_fire_at, self.now + timedelta(days=6))
+        self.assertFalse(NotificationDelivery.objects.filter(habit=stale).exists())
+        state = SchedulerState.objects.get(name=REMINDER_SCHEDULER)
+        self.assertEqual((state.watermark, state.lag), (self.now, timedelta(minutes=9)))
+        self.assertEqual(cache.get(REMINDER_LAG_CACHE_KEY), 540)
+
+    def test_split_into_ranges(self):
+        """Тест разбиения списка id на диапазоны."""
+
+        self.assertEqual(split_into_ranges([1, 4, 5, 9, 12], 2), [(1, 4), (5, 9), (12, 12)])
+        self.assertEqual(split_into_ranges([], 2), [])
+        self.assertEqual(split_into_ranges([1, 1, 1, 2, 3, 3, 4], 2), [(1, 1), (2, 3), (4, 4)])
+
+    @mock.patch("users.tasks.send_notifications", side_effect=fake_send_notifications)
+    def test_send_habit_notification_digest(self, mock_send):
+        """Тест объединения напоминаний пользователя в один дайджест."""
+
+        pleasant = Habit.objects.create(owner=self.user, name="Чай", is_pleasant=True)
+        self.create_habit(name="Медитация", action="Дышать", related_habit=pleasant)
+        Habit.objects.filter(pk=self.habit.pk).update(award="Сериал")
+        other = User.objects.create(email="other@sky.pro", tg_chat_id="200", notification_digest=False)
+        self.create_habit(name="Бег", owner=other)
+        self.create_habit(name="Отжимания", owner=other)
+        with override_settings(HABIT_NOTIFICATION_DIGEST=True), \
+                mock.patch("users.tasks.timezone.now", return_value=self.now):
+            send_habit_notification()
+        messages = mock_send.call_args.args[0]
+        self.assertEqual([chat_id for text, chat_id in messages], ["100", "200", "200"])
+        self.assertIn("Зарядка", messages[0][0])
+        self.assertIn("Медитация", messages[0][0])
+        self.assertIn("Сериал", messages[0][0])
+        self.assertIn("Чай", messages[0][0])
+        self.assertEqual(Habit.objects.filter(next_fire_at__lte=self.now).count(), 0)
+
+
+class TelegramClientTestCase(APITestCase):
+    """Тесты клиента Telegram с пулом соединений."""
+
+    def test_send_batch(self):
+        """Тест параллельной отправки с результатом по каждому сообщению."""
+
+        with FakeBotAPIServer(failing_chat_ids=["2"]) as server:
+            client = TelegramClient(base_url=server.base_url, token="test", max_workers=4)
+            results = client.send_batch([(f"Текст {number}", str(number)) for number in range(5)])
+            client.close()
+        self.assertEqual([result.chat_id for result in results], ["0", "1", "2", "3", "4"])
+        self.assertEqual([result.ok for result in results], [True, True, False, True, True])
+        self.assertEqual(results[2].status_code, 400)
+        self.assertEqual(server.requests_count, 5)
+
+    def test_rate_limited_response(self):
+        """Тест получения retry_after из ответа 429."""
+
+        with FakeBotAPIServer(rate_limit_every=2, retry_after=7) as server:
+            client = TelegramClient(base_url=server.base_url, token="test", max_workers=1)
+            results = client.send_batch([("Текст", "1"), ("Текст", "2")])
+            client.close()
+        self.assertTrue(results[0].ok)
+        self.assertEqual((results[1].status_code, results[1].retry_after), (429, 7))
+        self.assertTrue(results[1].retryable)
+
+
+class FakeClock:
+    """Управляемые часы для тестов ограничения частоты."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class NotificationDispatcherTestCase(APITestCase):
+    """Тесты ограничения частоты отправки уведомлений."""
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+
+        cache.clear()
+        self.clock = FakeClock()
+
+    def test_token_bucket(self):
+        """Тест выдачи токенов с учетом запаса и максимальной задержки."""
+
+        bucket = TokenBucket("test:bucket", rate=2, capacity=2, clock=self.clock)
+        self.assertEqual([bucket.reserve(), bucket.reserve()], [0, 0])
+        self.assertEqual(bucket.reserve(max_delay=0.1), 0.5)
+        self.assertEqual(bucket.reserve(), 0.5)
+        bucket.pause(10)
+        self.assertEqual(bucket.reserve(max_delay=5), 10)
+
+    def test_token_bucket_cancel(self):
+        """Тест возврата неиспользованного токена в корзину."""
+
+        bucket = TokenBucket("test:bucket", rate=1, clock=self.clock)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 1)
+        bucket.cancel()
+        self.assertEqual(bucket.reserve(), 1)
+
+    def test_dispatch_refunds_chat_token(self):
+        """Тест: сообщение, отклоненное общим лимитом, не расходует токен чата."""
+
+        client = mock.Mock(max_workers=1)
+        client.send.side_effect = lambda text, chat_id: NotificationResult(chat_id, True, 200)
+        dispatcher = NotificationDispatcher(client, global_rate=1, chat_rate=1, clock=self.clock,
+                                            sleep=self.clock.sleep)
+        results = dispatcher.dispatch([("1", "100"), ("2", "200")], max_delay=0)
+        self.assertEqual([result.ok for result in results], [True, False])
+        self.assertEqual(dispatcher.chat_bucket("200").reserve(max_delay=0), 0)
+
+    def test_dispatch_per_chat_rate(self):
+        """Тест ожидания токена чата и переноса сообщений сверх бюджета в очередь повтора."""
+
+        client = mock.Mock(max_workers=2)
+        client.send.side_effect = lambda text, chat_id: NotificationResult(chat_id, True, 200)
+        dispatcher = NotificationDispatcher(client, global_rate=30, chat_rate=1, clock=self.clock,
+                                            sleep=self.clock.sleep)
+        results = dispatcher.dispatch([("1", "100"), ("2", "100"), ("3", "200"), ("4", "100")], max_delay=1.5)
+        self.assertEqual([result.ok for result in results], [True, True, True, False])
+        self.assertEqual(self.clock.now, 1001.0)
+        self.assertTrue(results[3].retryable)
+        self.assertEqual(results[3].retry_after, 2)
+
+    def test_dispatch_chat_backlog_does_not_block_other_chats(self):
+        """Тест: ожидание токена одного чата не задерживает сообщения в другие чаты."""
+
+        client = mock.Mock(max_workers=4)
+        client.send.side_effect = lambda text, chat_id: NotificationResult(chat_id, True, 200)
+        dispatcher = NotificationDispatcher(client, global_rate=30, chat_rate=1, clock=self.clock,
+                                            sleep=self.clock.sleep)
+        messages = [(f"Текст {number}", str(chat_id)) for chat_id in range(100) for number in range(2)]
+        results = dispatcher.dispatch(messages, max_delay=40)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertLessEqual(self.clock.now - 1000, 200 / 30)
+
+    def test_send_notifications_logs_errors(self):
+        """Тест записи ошибок отправки в журнал."""
+
+        client = mock.Mock(max_workers=1)
+        client.send.side_effect = lambda text, chat_id: NotificationResult(chat_id, False, 403, "Forbidden")
+        dispatcher = NotificationDispatcher(client, clock=self.clock, sleep=self.clock.sleep)
+        with mock.patch("users.services._dispatcher", dispatcher), \
+                self.assertLogs("users.services", level="WARNING") as logs:
+            results = send_notifications([("1", "100")])
+        self.assertFalse(results[0].ok)
+        self.assertEqual(logs.output, ["WARNING:users.services:Ошибка при отправке уведомления в чат 100: Forbidden"])
+
+    @mock.patch("users.tasks.send_notifications")
+    def test_retry_notification(self, mock_send):
+        """Тест повторной отправки после ответа 429."""
+
+        mock_send.side_effect = [
+            [NotificationResult("100", False, 429, "Too Many Requests", retry_after=3)],
+            [NotificationResult("100", True, 200)],
+        ]
+        with mock.patch("users.tasks.retry_notification.apply_async", wraps=retry_notification.apply_async) as retry:
+            self.assertFalse(retry_notification("Текст", "100", 0))
+        retry.assert_called_once_with(("Текст", "100", 1, []), countdown=5)
+        self.assertEqual(mock_send.call_count, 2)
+
+
+class LeaderLeaseTestCase(APITestCase):
+    """Тесты выбора лидера среди экземпляров celery beat."""
+
+    def setUp(self):
+        """Задает начальные данные для тестов."""
+
+        cache.clear()
+
+    def test_single_leader(self):
+        """Тест: лидером является только один экземпляр, после освобождения лидерство переходит."""
+
+        first = LeaderLease("beat", ttl=30, owner="beat-1")
+        second = LeaderLease("beat", ttl=30, owner="beat-2")
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())
+        second.release()
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.acquire())
+
+    def test_database_lease(self):
+        """Тест аренды в базе данных: один лидер, переход лидерства после освобождения и истечения аренды."""
+
+        first = DatabaseLeaderLease("beat", ttl=30, owner="beat-1")
+        second = DatabaseLeaderLease("beat", ttl=30, owner="beat-2")
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        SchedulerLease.objects.filter(name="beat").update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+
+    def test_lease_backend(self):
+        """Тест выбора аренды в базе данных, если кеш локален для процесса."""
+
+        self.assertIsInstance(get_leader_lease("beat", ttl=30), DatabaseLeaderLease)
+        self.assertIsInstance(get_leader_lease("beat", ttl=30, cache=mock.Mock()), LeaderLease)
+
+    @mock.patch("django_celery_beat.schedulers.DatabaseScheduler.tick", return_value=60)
+    def test_scheduler_tick_only_on_leader(self, mock_tick):
+        """Тест: задачи отправляет только планировщик-лидер, остальные ждут не дольше трети аренды."""
+
+        schedulers = []
+        for owner in ("beat-1", "beat-2"):
+            scheduler = LeaderDatabaseScheduler.__new__(LeaderDatabaseScheduler)
+            scheduler.lease = LeaderLease("celery_beat", ttl=30, owner=owner)
+            schedulers.append(scheduler)
+        self.assertEqual([scheduler.tick() for scheduler in schedulers], [10, 10])
+        mock_tick.assert_called_once()
@@ -0,0 +1,76 @@
+import time
+import uuid
+
+from django.core.cache import cache as default_cache
+
+
+class TokenBucket:
+    """ Корзина токенов (алгоритм GCRA), состояние которой хранится в общем кеше Django.
+
+    При кеше на Redis состояние корзины разделяется всеми процессами воркеров.
+    """
+
+    lock_timeout = 1
+    lock_poll_interval = 0.002
+
+    def __init__(self, key, rate, capacity=1, cache=None, clock=time.time):
+        self.key = key
+        self.interval = 1 / rate
+        self.tolerance = (capacity - 1) * self.interval
+        self.cache = cache or default_cache
+        self.clock = clock
+
+    def reserve(self, max_delay=None):
+        """ Резервирует токен и возвращает задержку до его получения в секундах.
+
+        Если задержка больше max_delay, токен не резервируется.
+        """
+        with self.lock():
+            now = self.clock()
+            tat = max(self.cache.get(self.key, now), now)
+            delay = max(tat - self.tolerance - now, 0)
+            if max_delay is not None and delay > max_delay:
+                return delay
+            self.cache.set(self.key, tat + self.interval, timeout=int(tat + self.interval - now) + 60)
+            return delay
+
+    def cancel(self):
+        """ Возвращает в корзину токен, зарезервированный, но не использованный """
+        with self.lock():
+            now = self.clock()
+            tat = self.cache.get(self.key)
+            if tat is None:
+                return
+            tat = max(tat - self.interval, now)
+            self.cache.set(self.key, tat, timeout=int(tat - now) + 60)
+
+    def pause(self, seconds):
+        """ Запрещает выдачу токенов на указанное время (например, по retry_after от Bot API) """
+        with self.lock():
+            now = self.clock()
+            tat = max(self.cache.get(self.key, now), now + seconds + self.tolerance)
+            self.cache.set(self.key, tat, timeout=int(tat - now) + 60)
+
+    def lock(self):
+        """ Возвращает блокировку корзины в общем кеше """
+        return CacheLock(self.cache, f'{self.key}:lock', self.lock_timeout, self.lock_poll_interval)
+
+
+class CacheLock:
+    """ Простая блокировка на атомарной операции add кеша Django """
+
+    def __init__(self, cache, key, timeout, poll_interval):
+        self.cache = cache
+        self.key = key
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.token = uuid.uuid4().hex
+
+    def __enter__(self):
+        while not self.cache.add(self.key, self.token, timeout=self.timeout):
+            time.sleep(self.poll_interval)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.cache.get(self.key) == self.token:
+            self.cache.delete(self.key)